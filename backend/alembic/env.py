@@ -5,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from config import settings
 from database import Base
 import models
 
@@ -17,6 +18,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the same database the app uses (DATABASE_URL), not the URL in alembic.ini
+config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,35 @@
+"""orders history pagination
+
+Revision ID: 1d7a4c9e3b58
+Revises: e5b2d8f04a61
+Create Date: 2026-10-18 19:05:27.611902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d7a4c9e3b58'
+down_revision: Union[str, Sequence[str], None] = 'e5b2d8f04a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The keyset sort key must be NOT NULL for row-value comparisons to be total
+    op.execute("UPDATE orders SET created_at = now() WHERE created_at IS NULL")
+    op.alter_column('orders', 'created_at', nullable=False)
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+    # Serves selectinload(Order.items) and the summary aggregates
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
+    op.alter_column('orders', 'created_at', nullable=True)
@@ -0,0 +1,35 @@
+"""books rating sum
+
+Revision ID: 2c8f5e1a7d93
+Revises: 9b1e6f4d2c87
+Create Date: 2026-10-18 21:12:44.093561
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c8f5e1a7d93'
+down_revision: Union[str, Sequence[str], None] = '9b1e6f4d2c87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    # Seed the running totals (and resync the counts they pair with) in one pass
+    op.execute(
+        "UPDATE books SET rating_sum = r.total, rating_count = r.n, "
+        "average_rating = r.total::float8 / r.n "
+        "FROM (SELECT book_id, sum(score) AS total, count(*) AS n FROM ratings GROUP BY book_id) r "
+        "WHERE books.id = r.book_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'rating_sum')
@@ -0,0 +1,34 @@
+"""add book asset sizes
+
+Revision ID: 3c1f8e2a9b47
+Revises: 955b59eca027
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f8e2a9b47'
+down_revision: Union[str, Sequence[str], None] = '955b59eca027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('image_size', sa.Integer(), nullable=True))
+    op.add_column('books', sa.Column('pdf_size', sa.Integer(), nullable=True))
+    # octet_length reads the TOAST header only, so the backfill does not detoast the blobs
+    op.execute(
+        "UPDATE books SET image_size = octet_length(image_data), pdf_size = octet_length(pdf_data)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'pdf_size')
+    op.drop_column('books', 'image_size')
@@ -0,0 +1,41 @@
+"""books rating histogram
+
+Revision ID: 4e7b1c9a3f62
+Revises: 2c8f5e1a7d93
+Create Date: 2026-10-18 21:48:17.402316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b1c9a3f62'
+down_revision: Union[str, Sequence[str], None] = '2c8f5e1a7d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STARS = range(1, 6)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for star in STARS:
+        op.add_column('books', sa.Column(f'rating_{star}', sa.Integer(), server_default='0', nullable=False))
+    # Seed the star counts from the ratings table in one pass
+    op.execute(
+        "UPDATE books SET "
+        + ", ".join(f"rating_{star} = r.n{star}" for star in STARS)
+        + " FROM (SELECT book_id, "
+        + ", ".join(f"count(*) FILTER (WHERE score = {star}) AS n{star}" for star in STARS)
+        + " FROM ratings GROUP BY book_id) r "
+        "WHERE books.id = r.book_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for star in reversed(STARS):
+        op.drop_column('books', f'rating_{star}')
@@ -0,0 +1,49 @@
+"""books keyset pagination indexes
+
+Revision ID: 8e4d2b7c1a90
+Revises: 3c1f8e2a9b47
+Create Date: 2026-10-18 10:03:12.554871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4d2b7c1a90'
+down_revision: Union[str, Sequence[str], None] = '3c1f8e2a9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SORT_KEYS = ('title', 'author', 'price', 'created_at', 'average_rating')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sort keys must be NOT NULL for row-value keyset comparisons to be total
+    op.execute("UPDATE books SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL")
+    op.execute("UPDATE books SET average_rating = 0 WHERE average_rating IS NULL")
+    op.execute("UPDATE books SET rating_count = 0 WHERE rating_count IS NULL")
+    op.alter_column('books', 'created_at', nullable=False)
+    op.alter_column('books', 'average_rating', nullable=False, server_default='0')
+    op.alter_column('books', 'rating_count', nullable=False, server_default='0')
+
+    for key in SORT_KEYS:
+        op.create_index(f'ix_books_{key}_id', 'books', [key, 'id'], unique=False)
+    # (title, id) and (author, id) cover every lookup the single-column indexes served
+    op.drop_index(op.f('ix_books_title'), table_name='books')
+    op.drop_index(op.f('ix_books_author'), table_name='books')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_books_author'), 'books', ['author'], unique=False)
+    op.create_index(op.f('ix_books_title'), 'books', ['title'], unique=False)
+    for key in SORT_KEYS:
+        op.drop_index(f'ix_books_{key}_id', table_name='books')
+
+    op.alter_column('books', 'rating_count', nullable=True, server_default=None)
+    op.alter_column('books', 'average_rating', nullable=True, server_default=None)
+    op.alter_column('books', 'created_at', nullable=True)
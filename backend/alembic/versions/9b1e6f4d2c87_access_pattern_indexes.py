@@ -0,0 +1,95 @@
+"""access pattern indexes
+
+Revision ID: 9b1e6f4d2c87
+Revises: 7f3c2a9d6e14
+Create Date: 2026-10-18 20:31:06.748120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e6f4d2c87'
+down_revision: Union[str, Sequence[str], None] = '7f3c2a9d6e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One row per (user_id, book_id): the hot filter_by(user_id=..., book_id=...) lookups
+UNIQUE_PAIRS = ('payments', 'cart_items', 'ratings')
+# Single-column indexes on primary keys, duplicating the PK's own index
+REDUNDANT_PK_INDEXES = {
+    'users': 'ix_users_id',
+    'books': 'ix_books_id',
+    'orders': 'ix_orders_id',
+    'order_items': 'ix_order_items_id',
+    'ratings': 'ix_ratings_id',
+    'payments': 'ix_payments_id',
+    'cart_items': 'ix_cart_items_id',
+}
+
+
+def _dedupe() -> None:
+    # A repeated payment is the same purchase: keep the first
+    op.execute(
+        "DELETE FROM payments a USING payments b "
+        "WHERE a.user_id = b.user_id AND a.book_id = b.book_id AND a.id > b.id"
+    )
+    # Duplicate cart lines are merged into the oldest one
+    op.execute(
+        "UPDATE cart_items c SET quantity = d.total "
+        "FROM (SELECT min(id) AS id, sum(quantity) AS total FROM cart_items "
+        "      GROUP BY user_id, book_id HAVING count(*) > 1) d "
+        "WHERE c.id = d.id"
+    )
+    op.execute(
+        "DELETE FROM cart_items a USING cart_items b "
+        "WHERE a.user_id = b.user_id AND a.book_id = b.book_id AND a.id > b.id"
+    )
+    # Ratings have no timestamp, so the lowest id is kept; first recompute the
+    # aggregates of the affected books from the rows that will survive
+    op.execute(
+        "UPDATE books SET rating_count = r.n, average_rating = r.average "
+        "FROM (SELECT book_id, count(*) AS n, avg(score) AS average "
+        "      FROM (SELECT DISTINCT ON (user_id, book_id) book_id, score FROM ratings "
+        "            ORDER BY user_id, book_id, id) kept "
+        "      GROUP BY book_id) r "
+        "WHERE books.id = r.book_id AND books.id IN "
+        "      (SELECT book_id FROM ratings GROUP BY user_id, book_id HAVING count(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM ratings a USING ratings b "
+        "WHERE a.user_id = b.user_id AND a.book_id = b.book_id AND a.id > b.id"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE / DROP INDEX CONCURRENTLY cannot run inside a transaction, and
+    # do not block writes while they build. Deduplication runs in the same
+    # block, right before the unique builds. If a concurrent write slips in a
+    # new duplicate, the build fails: rerun the migration (an INVALID
+    # leftover index is dropped first).
+    with op.get_context().autocommit_block():
+        _dedupe()
+        for table in UNIQUE_PAIRS:
+            name = f'ix_{table}_user_id_book_id'
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+            op.create_index(name, table, ['user_id', 'book_id'], unique=True, postgresql_concurrently=True)
+        op.drop_index('ix_ratings_book_id', table_name='ratings', if_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_ratings_book_id', 'ratings', ['book_id'], unique=False, postgresql_concurrently=True)
+        # orders (user_id, created_at) is already served by ix_orders_user_id_created_at_id
+        for table, name in REDUNDANT_PK_INDEXES.items():
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table, name in REDUNDANT_PK_INDEXES.items():
+            op.create_index(name, table, ['id'], unique=False, if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_ratings_book_id', table_name='ratings', postgresql_concurrently=True)
+        for table in UNIQUE_PAIRS:
+            op.drop_index(f'ix_{table}_user_id_book_id', table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,29 @@
+"""users token version
+
+Revision ID: a4c8e1f2d305
+Revises: f19c5d3b7e62
+Create Date: 2026-10-18 15:12:44.209518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c8e1f2d305'
+down_revision: Union[str, Sequence[str], None] = 'f19c5d3b7e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Constant default: no table rewrite on Postgres 11+
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
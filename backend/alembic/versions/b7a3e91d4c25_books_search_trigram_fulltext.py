@@ -0,0 +1,42 @@
+"""books search trigram and full-text indexes
+
+Revision ID: b7a3e91d4c25
+Revises: 8e4d2b7c1a90
+Create Date: 2026-10-18 11:20:48.309117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7a3e91d4c25'
+down_revision: Union[str, Sequence[str], None] = '8e4d2b7c1a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        'books',
+        sa.Column('search_text', sa.String(), sa.Computed("lower(title || ' ' || author)", persisted=True)),
+    )
+    op.create_index(
+        'ix_books_search_trgm', 'books', ['search_text'],
+        postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_books_search_tsv', 'books', [sa.text("to_tsvector('simple', search_text)")],
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_search_tsv', table_name='books')
+    op.drop_index('ix_books_search_trgm', table_name='books')
+    op.drop_column('books', 'search_text')
@@ -0,0 +1,35 @@
+"""books asset store columns
+
+Revision ID: d2f6a0c84e13
+Revises: b7a3e91d4c25
+Create Date: 2026-10-18 12:41:05.772390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a0c84e13'
+down_revision: Union[str, Sequence[str], None] = 'b7a3e91d4c25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Blobs are moved out afterwards with `python commands.py backfill-assets`
+    op.add_column('books', sa.Column('image_sha256', sa.String(length=64), nullable=True))
+    op.add_column('books', sa.Column('image_mime', sa.String(), nullable=True))
+    op.add_column('books', sa.Column('pdf_sha256', sa.String(length=64), nullable=True))
+    op.add_column('books', sa.Column('pdf_mime', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'pdf_mime')
+    op.drop_column('books', 'pdf_sha256')
+    op.drop_column('books', 'image_mime')
+    op.drop_column('books', 'image_sha256')
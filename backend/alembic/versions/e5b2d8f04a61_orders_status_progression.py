@@ -0,0 +1,34 @@
+"""orders status progression
+
+Revision ID: e5b2d8f04a61
+Revises: c3e9b7a15d20
+Create Date: 2026-10-18 18:21:40.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2d8f04a61'
+down_revision: Union[str, Sequence[str], None] = 'c3e9b7a15d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('orders', sa.Column('shipped_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('orders', sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
+    op.drop_column('orders', 'delivered_at')
+    op.drop_column('orders', 'shipped_at')
+    op.drop_column('orders', 'processed_at')
@@ -0,0 +1,31 @@
+"""books image derivatives
+
+Revision ID: f19c5d3b7e62
+Revises: d2f6a0c84e13
+Create Date: 2026-10-18 13:58:27.401863
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19c5d3b7e62'
+down_revision: Union[str, Sequence[str], None] = 'd2f6a0c84e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by imaging.enqueue on upload and `python commands.py build-derivatives` for existing books
+    op.add_column('books', sa.Column('image_variants', sa.JSON(), nullable=True))
+    op.add_column('books', sa.Column('image_lqip', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'image_lqip')
+    op.drop_column('books', 'image_variants')
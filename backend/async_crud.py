@@ -0,0 +1,62 @@
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import models, pagination
+from crud import BOOK_RATINGS_COLUMNS, BOOK_SORT_COLUMNS, CART_LINE_COLUMNS, CATALOG_COLUMNS, ORDER_PAGE_COLUMNS, ORDER_SUMMARY_COLUMNS, search_clauses
+
+# ------------------------
+# ASYNC READ LOGIC
+# ------------------------
+# Counterparts of the crud.py reads for AsyncSession (asyncpg). Relationships
+# are never lazy-loaded here: anything a response needs is selected up front.
+
+async def get_catalog_page(db: AsyncSession, sort: str, descending: bool, limit: int, cursor: str = None):
+    columns = (BOOK_SORT_COLUMNS[sort], models.Book.id)
+    after = pagination.decode_cursor(cursor, sort, descending, columns) if cursor else None
+    rows = (await db.execute(pagination.seek(select(*CATALOG_COLUMNS), columns, descending, limit, after))).all()
+    return pagination.page(rows, limit, sort, descending, key=lambda row: (getattr(row, sort), row.id))
+
+async def search_books(db: AsyncSession, q: str, limit: int, cursor: str = None):
+    term = q.strip().lower()
+    rank, match = search_clauses(term)
+    columns = (rank, models.Book.id)
+    sort = f"search:{term}"
+    after = pagination.decode_cursor(cursor, sort, True, columns) if cursor else None
+    matches = select(*CATALOG_COLUMNS, rank.label("rank")).where(match)
+    rows = (await db.execute(pagination.seek(matches, columns, True, limit, after))).all()
+    return pagination.page(rows, limit, sort, True, key=lambda row: (row.rank, row.id))
+
+async def get_catalog_book(db: AsyncSession, book_id: UUID):
+    return (await db.execute(select(*CATALOG_COLUMNS).where(models.Book.id == book_id))).first()
+
+async def get_book_ratings(db: AsyncSession, book_ids):
+    return (await db.execute(select(*BOOK_RATINGS_COLUMNS).where(models.Book.id.in_(book_ids)))).all()
+
+async def get_user_orders(db: AsyncSession, user_id: UUID, limit: int, cursor: str = None, summary: bool = False):
+    after = pagination.decode_cursor(cursor, "orders", True, ORDER_PAGE_COLUMNS) if cursor else None
+    if summary:
+        query = select(*ORDER_SUMMARY_COLUMNS)
+    else:
+        query = select(models.Order).options(selectinload(models.Order.items))
+    page = pagination.seek(query.where(models.Order.user_id == user_id), ORDER_PAGE_COLUMNS, True, limit, after)
+    result = await db.execute(page)
+    rows = result.all() if summary else result.scalars().all()
+    return pagination.page(rows, limit, "orders", True, key=lambda row: (row.created_at, row.id))
+
+async def get_cart(db: AsyncSession, user_id: UUID):
+    result = await db.execute(
+        select(*CART_LINE_COLUMNS)
+        .join(models.CartItem.book)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )
+    return result.all()
+
+async def has_paid(db: AsyncSession, user_id: UUID, book_id: UUID) -> bool:
+    result = await db.execute(
+        select(models.Payment.id).where(models.Payment.user_id == user_id, models.Payment.book_id == book_id).limit(1)
+    )
+    return result.first() is not None
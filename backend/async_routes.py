@@ -0,0 +1,116 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import async_crud, auth, crud, schemas
+from cache import catalog
+from database import get_async_db
+
+# ------------------------
+# ASYNC READ ROUTES
+# ------------------------
+# Same paths and payloads as the sync handlers in main.py, served on the
+# asyncpg engine so a request waiting on Postgres holds no threadpool slot.
+# main.py includes this router ahead of its own routes when ASYNC_DB is on.
+
+router = APIRouter()
+
+
+@router.get("/books", response_model=schemas.BookPage)
+async def read_books_async(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: schemas.BookSort = schemas.BookSort.title,
+    order: schemas.SortOrder = schemas.SortOrder.asc,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def fill():
+        rows, next_cursor = await async_crud.get_catalog_page(db, sort.value, order == schemas.SortOrder.desc, limit, cursor)
+        return schemas.BookPage(items=[crud.to_book(row) for row in rows], next_cursor=next_cursor).model_dump_json().encode()
+
+    try:
+        body = await catalog.aget_or_fill(catalog.list_key("books", sort.value, order.value, limit, cursor), fill)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/books/search", response_model=schemas.BookPage)
+async def search_books_async(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def fill():
+        rows, next_cursor = await async_crud.search_books(db, q, limit, cursor)
+        return schemas.BookPage(items=[crud.to_book(row) for row in rows], next_cursor=next_cursor).model_dump_json().encode()
+
+    try:
+        body = await catalog.aget_or_fill(catalog.list_key("search", q.strip().lower(), limit, cursor), fill)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/books/ratings", response_model=List[schemas.BookRatings])
+async def read_book_ratings_async(ids: str = Query(..., max_length=4000), db: AsyncSession = Depends(get_async_db)):
+    try:
+        book_ids = crud.parse_book_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [crud.to_book_ratings(row) for row in await async_crud.get_book_ratings(db, book_ids)]
+
+
+@router.get("/books/{book_id}", response_model=schemas.Book)
+async def get_single_book_async(book_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    async def fill():
+        book = await async_crud.get_catalog_book(db, book_id)
+        return crud.to_book(book).model_dump_json().encode() if book else None
+
+    body = await catalog.aget_or_fill(catalog.book_key(book_id), fill)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/books/{book_id}/access")
+async def check_book_access_async(
+    book_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_user_async),
+):
+    return {"has_access": await async_crud.has_paid(db, current_user.id, book_id)}
+
+
+@router.get("/users/me", response_model=schemas.UserOut)
+async def read_users_me_async(current_user: auth.Principal = Depends(auth.get_current_user_async)):
+    return current_user
+
+
+@router.get("/orders", response_model=Union[schemas.OrderPage, schemas.OrderSummaryPage])
+async def get_my_orders_async(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_user_async),
+):
+    try:
+        rows, next_cursor = await async_crud.get_user_orders(db, current_user.id, limit, cursor, summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary:
+        return schemas.OrderSummaryPage.model_validate({"items": rows, "next_cursor": next_cursor}, from_attributes=True)
+    return schemas.OrderPage.model_validate({"items": rows, "next_cursor": next_cursor}, from_attributes=True)
+
+
+@router.get("/cart", response_model=List[schemas.CartLine])
+async def get_cart_async(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_user_async),
+):
+    return [schemas.CartLine(**row._mapping) for row in await async_crud.get_cart(db, current_user.id)]
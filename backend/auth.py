@@ -1,14 +1,25 @@
-from datetime import datetime, timedelta
-from typing import Optional
+import hashlib
+import hmac
+import secrets
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
 
 from jose import JWTError, jwt
 from jose.exceptions import ExpiredSignatureError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import SessionLocal
+from cache import principals
+from config import settings
+from database import SessionLocal, get_async_db, get_db
+import hashing
+import metrics
 import models
 
 # JWT config
@@ -16,29 +27,27 @@ SECRET_KEY = "zzjSe8TIIoIPqtD2ljk5N80cNLgGjgXcg6uGBCUpyTI"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 scheme (✅ fixed tokenUrl to match /token)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+# bcrypt runs on hashing's process pool; both raise hashing.HashingBusy when it is saturated
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_and_update(plain_password, hashed_password)[0]
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
     user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
         return None
+    valid, new_hash = hashing.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        # Stored with an older cost factor: upgrade while we have the plaintext
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -47,12 +56,139 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# ------------------------
+# REFRESH TOKENS
+# ------------------------
+# Long-lived opaque tokens that renew the 30-minute access token without the
+# password, so renewals cost one indexed lookup plus an HMAC, not a bcrypt
+# verify. Only the HMAC is stored. Each refresh rotates the token; replaying
+# an already rotated one means it leaked, and revokes the whole login family.
+
+def _refresh_hash(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def _refresh_error() -> HTTPException:
+    return HTTPException(status_code=401, detail="Invalid refresh token", headers={"WWW-Authenticate": "Bearer"})
+
+def issue_refresh_token(db: Session, user_id: UUID, family_id: Optional[UUID] = None) -> str:
+    """Add a refresh token row (the caller commits) and return the token."""
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=_refresh_hash(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days),
+    ))
+    return token
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[dict, str]:
+    """Spend a refresh token: return fresh access-token claims and its replacement.
+
+    Role and token version are re-read from users, so a refresh also picks up
+    promotions and demotions.
+    """
+    row = (
+        db.query(models.RefreshToken, models.User, (models.RefreshToken.expires_at > func.now()).label("live"))
+        .join(models.User, models.User.id == models.RefreshToken.user_id)
+        .filter(models.RefreshToken.token_hash == _refresh_hash(token))
+        .with_for_update(of=models.RefreshToken)
+        .first()
+    )
+    if row is None:
+        raise _refresh_error()
+    refresh, user, live = row
+    if refresh.used_at is not None:
+        revoke_refresh_family(db, refresh.family_id)
+        db.commit()
+        raise _refresh_error()
+    if refresh.revoked_at is not None or not live:
+        raise _refresh_error()
+    refresh.used_at = func.now()
+    claims = token_claims(user)
+    new_token = issue_refresh_token(db, user.id, refresh.family_id)
+    db.commit()
+    return claims, new_token
+
+def revoke_refresh_family(db: Session, family_id: UUID):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == family_id, models.RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": func.now()}, synchronize_session=False)
+
+def revoke_refresh_token(db: Session, token: str):
+    """Logout: end the login family the token belongs to."""
+    family_id = db.query(models.RefreshToken.family_id).filter(models.RefreshToken.token_hash == _refresh_hash(token)).scalar()
+    if family_id is not None:
+        revoke_refresh_family(db, family_id)
+        db.commit()
+
+def purge_refresh_tokens(batch_size: int = 5000) -> int:
+    """Delete expired refresh tokens in batches; returns the number removed."""
+    removed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            expired = (
+                select(models.RefreshToken.id)
+                .where(models.RefreshToken.expires_at < func.now())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            deleted = db.query(models.RefreshToken).filter(models.RefreshToken.id.in_(expired)).delete(synchronize_session=False)
+            db.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+    finally:
+        db.close()
+
+# ------------------------
+# TOKEN VERSIONS
+# ------------------------
+# Access tokens carry uid / role / ver claims, so authorization can trust the
+# signature instead of reading users. users.token_version is the revocation
+# lever: a token whose ver is below it was issued before a role change and is
+# rejected. Only users that were ever bumped (version > 0) are tracked.
+
+class TokenVersions:
+    def __init__(self):
+        self._versions: Dict[UUID, int] = {}
+        self._lock = threading.Lock()
+        self.revoked = metrics.counter("auth_tokens_revoked_total", "Requests rejected for a stale token version")
+        metrics.gauge("auth_token_versions_tracked", "Users with a bumped token version", lambda: len(self._versions))
+
+    def current(self, user_id: UUID) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: UUID, version: int):
+        # Versions only grow, so merging by max makes refresh/bump races harmless
+        with self._lock:
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+
+    def refresh(self):
+        """Pull bumps made by other workers; run periodically from main.lifespan."""
+        db = SessionLocal()
+        try:
+            rows = db.query(models.User.id, models.User.token_version).filter(models.User.token_version > 0).all()
+        finally:
+            db.close()
+        for row in rows:
+            self.bump(row.id, row.token_version)
+
+token_versions = TokenVersions()
+
+def token_claims(user: models.User) -> dict:
+    return {"sub": user.username, "uid": str(user.id), "role": user.role, "ver": user.token_version}
+
+def _decode_token(token: str) -> dict:
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: Optional[str] = payload.get("sub")
@@ -62,13 +198,81 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise HTTPException(status_code=401, detail="Token has expired")
     except JWTError:
         raise credentials_exception
+    if payload.get("uid") is not None:
+        try:
+            payload["uid"] = UUID(payload["uid"])
+        except (TypeError, ValueError):
+            raise credentials_exception
+        if payload.get("ver", 0) < token_versions.current(payload["uid"]):
+            token_versions.revoked.inc()
+            raise HTTPException(status_code=401, detail="Token has been revoked", headers={"WWW-Authenticate": "Bearer"})
+    return payload
 
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+class Principal(NamedTuple):
+    """Detached snapshot of the authenticated user, shared across requests."""
+    id: UUID
+    username: str
+    email: Optional[str]
+    role: str
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.username, user.email, user.role)
+
+def _load_principal(db: Session, username: str) -> Principal:
+    principal, epoch = principals.get(username)
+    if principal is None:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        if user is None:
+            raise _credentials_exception()
+        principal = Principal.from_user(user)
+        principals.put(username, principal, epoch)
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    return _load_principal(db, _decode_token(token)["sub"])
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    username = _decode_token(token)["sub"]
+    principal, epoch = principals.get(username)
+    if principal is None:
+        user = (await db.execute(select(models.User).where(models.User.username == username))).scalar_one_or_none()
+        if user is None:
+            raise _credentials_exception()
+        principal = Principal.from_user(user)
+        principals.put(username, principal, epoch)
+    return principal
+
+# Any committed change to a user (make_admin, deletion, ...) drops their cached
+# principal. Flushes only record the username; the cache is touched after
+# COMMIT so a concurrent reader cannot re-cache the pre-commit row.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    changed = Session.object_session(target).info.setdefault("changed_principals", set())
+    changed.add(target.username)
+    changed.update(inspect(target).attrs.username.history.deleted)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    for username in session.info.pop("changed_principals", ()):
+        principals.invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principals(session):
+    session.info.pop("changed_principals", None)
+
+def admin_only(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Role check from the signed claims: no database access for current tokens.
 
-def admin_only(current_user: models.User = Depends(get_current_user)):
+    The returned principal is built from the claims, so email is None.
+    """
+    payload = _decode_token(token)
+    if payload.get("uid") is not None and "role" in payload:
+        current_user = Principal(payload["uid"], payload["sub"], None, payload["role"])
+    else:
+        # Token issued before uid / ver claims existed
+        current_user = _load_principal(db, payload["sub"])
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,119 @@
+"""Throughput / tail-latency benchmark: sync routes vs. the async (asyncpg) routes.
+
+Run from backend/ against a scratch database that already holds some books:
+
+    python -m benchmarks.concurrency_bench --concurrency 500 --duration 30
+
+For each mode the script starts `uvicorn main:app` with ASYNC_DB=0 / 1 and the
+catalog cache disabled (so every request reaches Postgres), drives it with
+--concurrency clients looping over the catalog listing, book detail and
+/users/me, and prints requests/s with p50/p95/p99. Pass --url to measure an
+already running server instead (one mode, whatever it is configured for).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+def percentile(timings, p):
+    return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+
+async def login(client: httpx.AsyncClient) -> dict:
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    await client.post("/register", json={"username": username, "email": f"{username}@example.com", "password": "bench-password"})
+    token = (await client.post("/token", data={"username": username, "password": "bench-password"})).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def load(url: str, concurrency: int, duration: float):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        headers = await login(client)
+        book_ids = [book["id"] for book in (await client.get("/books", params={"limit": 100})).json()["items"]]
+        if not book_ids:
+            sys.exit("no books in the database; create some first")
+        paths = [("/books?limit=20", None), ("/users/me", headers)]
+
+        timings = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path, auth = random.choice(paths + [(f"/books/{random.choice(book_ids)}", None)])
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=auth)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    timings.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    timings.sort()
+    if not timings:
+        print(f"  no successful requests ({errors} errors)")
+        return
+    print(
+        f"  requests={len(timings)} errors={errors} rps={len(timings) / elapsed:.0f} "
+        f"p50={percentile(timings, 0.50):.1f}ms p95={percentile(timings, 0.95):.1f}ms p99={percentile(timings, 0.99):.1f}ms"
+    )
+
+
+def serve(settings_env: dict, port: int, workers: int) -> subprocess.Popen:
+    """Start `uvicorn main:app` with extra settings in its environment; wait until it answers."""
+    env = {**os.environ, **settings_env}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="benchmark a running server instead of starting one per mode")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(load(args.url, args.concurrency, args.duration))
+        return
+
+    for async_db in (False, True):
+        print(f"{'async' if async_db else 'sync'} routes, {args.concurrency} clients, {args.duration:.0f}s:")
+        server = serve({"ASYNC_DB": "1" if async_db else "0", "CATALOG_CACHE_TTL": "0"}, args.port, args.workers)
+        try:
+            asyncio.run(load(f"http://127.0.0.1:{args.port}", args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
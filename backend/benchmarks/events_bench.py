@@ -0,0 +1,108 @@
+"""Idle order-event subscribers held by one worker.
+
+Run from backend/ against a scratch database that already holds some books:
+
+    python -m benchmarks.events_bench --subscribers 10000
+
+Starts `uvicorn main:app` with one worker (or uses --url), places an order and
+opens --subscribers concurrent GET /orders/{id}/events streams on raw sockets.
+Once all of them have their first event it prints the server's
+events_subscribers gauge, its resident memory per stream (local server only)
+and how long it takes for every stream to receive a heartbeat. Raise the open
+file limit (ulimit -n) above the subscriber count first.
+"""
+import argparse
+import asyncio
+import re
+import sys
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmarks.concurrency_bench import login, serve
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        return int(re.search(r"VmRSS:\s+(\d+)", status.read()).group(1))
+
+
+async def subscribe(host: str, port: int, path: str, ready: asyncio.Event, pings: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    await reader.readuntil(b"\n\n")  # retry:
+    await reader.readuntil(b"\n\n")  # snapshot event
+    ready.set()
+    try:
+        while True:
+            chunk = await reader.readuntil(b"\n\n")
+            if b": ping" in chunk:
+                pings.append(time.perf_counter())
+    finally:
+        writer.close()
+
+
+async def load(url: str, subscribers: int, pid=None):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        headers = await login(client)
+        books = (await client.get("/books", params={"limit": 1})).json()["items"]
+        if not books:
+            sys.exit("no books in the database; create some first")
+        order = (await client.post("/orders", json={"items": [{"book_id": books[0]["id"], "quantity": 1}]}, headers=headers)).json()
+        baseline = rss_kb(pid) if pid else None
+
+        parts = urlsplit(url)
+        path = f"/orders/{order['id']}/events"
+        pings = []
+        events = [asyncio.Event() for _ in range(subscribers)]
+        started = time.perf_counter()
+        tasks = []
+        for event in events:
+            tasks.append(asyncio.create_task(subscribe(parts.hostname, parts.port, path, event, pings)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*(event.wait() for event in events))
+        print(f"  {subscribers} streams open in {time.perf_counter() - started:.1f}s")
+
+        metrics = (await client.get("/metrics")).text
+        gauge = re.search(r"^events_subscribers (\S+)", metrics, re.M)
+        print(f"  events_subscribers={gauge.group(1) if gauge else '?'}")
+        if pid:
+            print(f"  server RSS +{(rss_kb(pid) - baseline) / 1024:.1f} MiB, {(rss_kb(pid) - baseline) / subscribers:.1f} KiB per stream")
+
+        # Every idle stream should see one heartbeat per interval
+        pings.clear()
+        waited = time.perf_counter()
+        while len(pings) < subscribers:
+            await asyncio.sleep(0.5)
+        print(f"  {len(pings)} heartbeats received within {time.perf_counter() - waited:.1f}s")
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--heartbeat", type=float, default=5, help="ORDER_EVENTS_HEARTBEAT_SECONDS for the started server")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    args = parser.parse_args()
+
+    print(f"{args.subscribers} idle /orders/{{id}}/events subscribers:")
+    if args.url:
+        asyncio.run(load(args.url, args.subscribers))
+        return
+    server = serve({"ORDER_EVENTS_HEARTBEAT_SECONDS": str(args.heartbeat)}, args.port, 1)
+    try:
+        asyncio.run(load(f"http://127.0.0.1:{args.port}", args.subscribers, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Login throughput vs. catalog latency under mixed load.
+
+Run from backend/ against a scratch database that already holds some books:
+
+    python -m benchmarks.login_bench --logins 50 --readers 100 --duration 30
+
+Starts `uvicorn main:app` twice: with HASH_WORKERS=0 (bcrypt inline in the
+request threadpool, the old behaviour) and with the process pool
+(--hash-workers). In each mode --logins clients loop on POST /token while
+--readers clients loop on GET /books with the catalog cache disabled. The
+script prints successful logins/s, 503s shed by the pool, and p50/p99 for
+both request kinds. Pass --url to measure an already running server instead.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.concurrency_bench import percentile, serve
+
+PASSWORD = "bench-password"
+
+
+async def load(url: str, logins: int, readers: int, duration: float):
+    limits = httpx.Limits(max_connections=logins + readers, max_keepalive_connections=logins + readers)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        username = f"bench-{uuid.uuid4().hex[:8]}"
+        await client.post("/register", json={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+
+        login_times, read_times = [], []
+        shed = errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def login():
+            nonlocal shed, errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/token", data={"username": username, "password": PASSWORD})
+                if response.status_code == 200:
+                    login_times.append((time.perf_counter() - start) * 1000)
+                elif response.status_code == 503:
+                    shed += 1
+                    await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+                else:
+                    errors += 1
+
+        async def read():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get("/books", params={"limit": 20})
+                if response.status_code == 200:
+                    read_times.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[login() for _ in range(logins)], *[read() for _ in range(readers)])
+        elapsed = time.perf_counter() - started
+
+    login_times.sort()
+    read_times.sort()
+    if login_times:
+        print(
+            f"  logins: ok/s={len(login_times) / elapsed:.1f} shed(503)={shed} "
+            f"p50={percentile(login_times, 0.50):.0f}ms p99={percentile(login_times, 0.99):.0f}ms"
+        )
+    if read_times:
+        print(
+            f"  catalog: req/s={len(read_times) / elapsed:.0f} "
+            f"p50={percentile(read_times, 0.50):.1f}ms p99={percentile(read_times, 0.99):.1f}ms"
+        )
+    print(f"  other errors={errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--url", help="benchmark a running server instead of starting one per mode")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(load(args.url, args.logins, args.readers, args.duration))
+        return
+
+    for hash_workers in (0, args.hash_workers):
+        mode = "inline bcrypt" if hash_workers == 0 else f"bcrypt pool ({hash_workers} workers)"
+        print(f"{mode}, {args.logins} login + {args.readers} catalog clients, {args.duration:.0f}s:")
+        server = serve({"HASH_WORKERS": str(hash_workers), "CATALOG_CACHE_TTL": "0"}, args.port, 1)
+        try:
+            asyncio.run(load(f"http://127.0.0.1:{args.port}", args.logins, args.readers, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Order placement latency by basket size.
+
+Run from backend/ against a scratch database that already holds some books:
+
+    python -m benchmarks.order_bench --sizes 1,10,50,100,500 --orders 50
+
+Starts `uvicorn main:app` (or uses --url), registers a user and places
+--orders orders of each size through POST /orders, cycling over the first
+100 catalog books for the line items. Prints p50/p99 per order and the p50
+cost per line item, which should stay roughly flat as baskets grow now that
+the items go in as one multi-row INSERT.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from benchmarks.concurrency_bench import login, percentile, serve
+
+
+async def load(url: str, sizes, orders: int, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        headers = await login(client)
+        book_ids = [book["id"] for book in (await client.get("/books", params={"limit": 100})).json()["items"]]
+        if not book_ids:
+            sys.exit("no books in the database; create some first")
+
+        for size in sizes:
+            body = {"items": [{"book_id": book_ids[i % len(book_ids)], "quantity": 1} for i in range(size)]}
+            timings = []
+            errors = 0
+            remaining = orders
+
+            async def worker():
+                nonlocal remaining, errors
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    response = await client.post("/orders", json=body, headers=headers)
+                    if response.status_code == 200:
+                        timings.append((time.perf_counter() - start) * 1000)
+                    else:
+                        errors += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            timings.sort()
+            if not timings:
+                print(f"  {size:>4} items: no successful orders ({errors} errors)")
+                continue
+            print(
+                f"  {size:>4} items: p50={percentile(timings, 0.50):.1f}ms p99={percentile(timings, 0.99):.1f}ms "
+                f"per item={percentile(timings, 0.50) / size:.2f}ms errors={errors}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,50,100,500", help="comma-separated line item counts")
+    parser.add_argument("--orders", type=int, default=50, help="orders placed per size")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"POST /orders, {args.orders} orders per size, {args.concurrency} clients:")
+    if args.url:
+        asyncio.run(load(args.url, sizes, args.orders, args.concurrency))
+        return
+    server = serve({}, args.port, 1)
+    try:
+        asyncio.run(load(f"http://127.0.0.1:{args.port}", sizes, args.orders, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Latency benchmark for GET /books/search (crud.search_books).
+
+Run from backend/ against a scratch database:
+
+    python -m benchmarks.search_bench --rows 1000000 --seed
+
+--seed inserts synthetic books (description 'search-bench') until the catalog
+holds --rows of them; --cleanup deletes them again. Reports p50/p95/p99 over
+a mix of exact, prefix, substring and misspelled queries, and prints the
+plan of one query so index usage can be checked.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+import crud
+from database import SessionLocal
+
+WORDS = [
+    "ancient", "shadow", "river", "empire", "garden", "silent", "winter", "dragon",
+    "kingdom", "memory", "ocean", "stone", "crimson", "forest", "journey", "secret",
+    "storm", "harvest", "mirror", "lantern", "desert", "island", "golden", "night",
+]
+AUTHORS = [
+    "Achebe", "Adichie", "Soyinka", "Morrison", "Tolstoy", "Austen", "Okri", "Murakami",
+    "Atwood", "Dickens", "Emecheta", "Ngugi", "Rowling", "Orwell", "Woolf", "Borges",
+]
+QUERIES = [
+    "shadow", "dragon kingdom", "achebe", "silent riv", "ocen", "crimsn forest",
+    "murakmi", "golden island", "lantern", "adichie winter", "storm harvst", "mirror",
+]
+
+
+def seed(db, rows: int, batch: int = 50_000):
+    have = db.execute(text("SELECT count(*) FROM books WHERE description = 'search-bench'")).scalar()
+    words = "ARRAY[" + ",".join(f"'{w}'" for w in WORDS) + "]"
+    authors = "ARRAY[" + ",".join(f"'{a}'" for a in AUTHORS) + "]"
+    while have < rows:
+        n = min(batch, rows - have)
+        db.execute(text(f"""
+            INSERT INTO books (id, title, author, price, description, average_rating, rating_count)
+            SELECT gen_random_uuid(),
+                   initcap(({words})[1 + floor(random() * {len(WORDS)})::int] || ' ' ||
+                           ({words})[1 + floor(random() * {len(WORDS)})::int] || ' ' || g),
+                   ({authors})[1 + floor(random() * {len(AUTHORS)})::int],
+                   round((random() * 10000)::numeric, 2),
+                   'search-bench', 0, 0
+            FROM generate_series(1, :n) AS g
+        """), {"n": n})
+        db.commit()
+        have += n
+        print(f"seeded {have}/{rows}")
+    db.execute(text("ANALYZE books"))
+    db.commit()
+
+
+def cleanup(db):
+    db.execute(text("DELETE FROM books WHERE description = 'search-bench'"))
+    db.commit()
+
+
+def run(db, iterations: int, limit: int):
+    timings = []
+    for _ in range(iterations):
+        q = random.choice(QUERIES)
+        start = time.perf_counter()
+        crud.search_books(db, q, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.rollback()
+    timings.sort()
+    pick = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+    print(f"queries={iterations} limit={limit}")
+    print(f"mean={statistics.mean(timings):.2f}ms p50={pick(0.50):.2f}ms p95={pick(0.95):.2f}ms p99={pick(0.99):.2f}ms")
+
+
+def explain(db, q: str, limit: int):
+    # Same predicate and ranking as crud.search_books
+    plan = db.execute(text(
+        "EXPLAIN (ANALYZE, BUFFERS) "
+        "SELECT id FROM books "
+        "WHERE search_text %> :q OR to_tsvector('simple', search_text) @@ websearch_to_tsquery('simple', :q) "
+        "ORDER BY word_similarity(:q, search_text) "
+        "+ ts_rank(to_tsvector('simple', search_text), websearch_to_tsquery('simple', :q)) DESC, id DESC "
+        "LIMIT :limit"
+    ), {"q": q, "limit": limit})
+    print("\n".join(row[0] for row in plan))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.cleanup:
+            cleanup(db)
+            return
+        if args.seed:
+            seed(db, args.rows)
+        crud.search_books(db, "warmup", args.limit)
+        run(db, args.iterations, args.limit)
+        explain(db, "crimsn forest", args.limit)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
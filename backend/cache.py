@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+import metrics
+from config import settings
+
+# ------------------------
+# CATALOG CACHE
+# ------------------------
+# Holds the serialized JSON bytes of catalog responses (listing pages, search
+# pages, book details) so hot reads skip both the query and the pydantic
+# serialization. Writes invalidate in-process; the TTL bounds staleness for
+# the other worker processes, which do not see those invalidations.
+
+
+class CatalogCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation: a fill that started before one is not stored
+        self._epoch = 0
+        # Listing/search keys embed this, so invalidating every page is O(1)
+        self._list_generation = 0
+
+        self.hits = metrics.counter("catalog_cache_hits_total", "Catalog reads served from memory")
+        self.misses = metrics.counter("catalog_cache_misses_total", "Catalog reads that ran a query")
+        self.invalidations = metrics.counter("catalog_cache_invalidations_total", "Catalog cache invalidations")
+        metrics.gauge("catalog_cache_entries", "Entries held by the catalog cache", lambda: len(self._entries))
+
+    def list_key(self, *parts) -> tuple:
+        return ("list", self._list_generation) + parts
+
+    def book_key(self, book_id) -> tuple:
+        return ("book", str(book_id))
+
+    def get_or_fill(self, key: Hashable, fill: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """Return the cached value, or run fill() once per key while concurrent callers wait.
+
+        None results (e.g. a missing book) are returned but not cached.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits.inc()
+                    return entry[1]
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    waiter = self._inflight[key] = threading.Event()
+                    epoch = self._epoch
+                    break
+            # Single flight: wait for the leader, then re-check (it may have failed)
+            waiter.wait(timeout=5)
+
+        self.misses.inc()
+        value = None
+        try:
+            value = fill()
+            return value
+        finally:
+            with self._lock:
+                self._store(key, value, epoch)
+                self._inflight.pop(key, None)
+            waiter.set()
+
+    async def aget_or_fill(self, key: Hashable, fill: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """get_or_fill for async routes: waiters await the leader instead of blocking the event loop."""
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits.inc()
+                    return entry[1]
+                waiter = self._async_inflight.get(key)
+                if waiter is None:
+                    waiter = self._async_inflight[key] = asyncio.Event()
+                    epoch = self._epoch
+                    break
+            await waiter.wait()
+
+        self.misses.inc()
+        value = None
+        try:
+            value = await fill()
+            return value
+        finally:
+            with self._lock:
+                self._store(key, value, epoch)
+                self._async_inflight.pop(key, None)
+            waiter.set()
+
+    def _store(self, key, value, epoch):
+        # Caller holds self._lock
+        if value is not None and epoch == self._epoch:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_listing(self):
+        with self._lock:
+            self._epoch += 1
+            self._list_generation += 1
+        self.invalidations.inc()
+
+    def invalidate_book(self, book_id):
+        """A book changed: drop its detail entry and every listing page."""
+        with self._lock:
+            self._epoch += 1
+            self._list_generation += 1
+            self._entries.pop(self.book_key(book_id), None)
+        self.invalidations.inc()
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._list_generation += 1
+            self._entries.clear()
+        self.invalidations.inc()
+
+
+catalog = CatalogCache(settings.catalog_cache_ttl, settings.catalog_cache_max_entries)
+
+
+# ------------------------
+# PRINCIPAL CACHE
+# ------------------------
+# Authenticated-user snapshots keyed by token subject, so authenticated routes
+# skip the per-request users lookup. Same staleness model as the catalog:
+# committed user changes invalidate in-process, the TTL bounds other workers.
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+
+        self.hits = metrics.counter("auth_principal_cache_hits_total", "Authenticated requests served without a user lookup")
+        self.misses = metrics.counter("auth_principal_cache_misses_total", "Authenticated requests that loaded the user")
+        self.invalidations = metrics.counter("auth_principal_cache_invalidations_total", "Principal cache invalidations")
+        metrics.gauge("auth_principal_cache_entries", "Entries held by the principal cache", lambda: len(self._entries))
+        metrics.gauge("auth_principal_cache_hit_ratio", "Principal cache hits / lookups since start", self.hit_ratio)
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits.value + self.misses.value
+        return self.hits.value / lookups if lookups else 0.0
+
+    def get(self, username: str):
+        """Return (principal, epoch); principal is None on a miss.
+
+        Pass the epoch back to put() so a load that raced an invalidation is dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(username)
+                self.hits.inc()
+                return entry[1], self._epoch
+            epoch = self._epoch
+        self.misses.inc()
+        return None, epoch
+
+    def put(self, username: str, principal, epoch: int):
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[username] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(username, None)
+        self.invalidations.inc()
+
+
+principals = PrincipalCache(settings.principal_cache_ttl, settings.principal_cache_max_entries)
@@ -0,0 +1,168 @@
+"""Maintenance commands, run from backend/:
+
+    python commands.py backfill-assets [--batch-size 100]
+    python commands.py build-derivatives [--workers 4] [--batch-size 100]
+    python commands.py purge-refresh-tokens [--batch-size 5000]
+    python commands.py purge-idempotency-keys [--batch-size 5000]
+    python commands.py reconcile-ratings
+"""
+import argparse
+import io
+import multiprocessing
+
+from sqlalchemy import and_, or_
+
+import auth
+import crud
+import idempotency
+import imaging
+import models
+import storage
+import tasks
+from database import SessionLocal
+
+
+# ------------------------
+# ASSETS
+# ------------------------
+
+def backfill_assets(batch_size: int):
+    """Move legacy image_data / pdf_data blobs into the asset store.
+
+    Walks books by id in batches and loads one row's blobs at a time, so
+    memory stays bounded by the largest single blob. Each batch commits on
+    its own; rerunning resumes where a previous run stopped.
+    """
+    store = storage.get_asset_store()
+    pending = or_(
+        and_(models.Book.image_data.isnot(None), models.Book.image_sha256.is_(None)),
+        and_(models.Book.pdf_data.isnot(None), models.Book.pdf_sha256.is_(None)),
+    )
+    db = SessionLocal()
+    moved = 0
+    last_id = None
+    try:
+        while True:
+            query = db.query(models.Book.id).filter(pending)
+            if last_id is not None:
+                query = query.filter(models.Book.id > last_id)
+            ids = [row.id for row in query.order_by(models.Book.id).limit(batch_size)]
+            if not ids:
+                break
+            for book_id in ids:
+                row = db.query(models.Book.image_data, models.Book.pdf_data).filter(models.Book.id == book_id).one()
+                values = {}
+                if row.image_data is not None:
+                    # Legacy covers were always served as image/jpeg
+                    asset = store.save(io.BytesIO(row.image_data), "image/jpeg")
+                    values.update(image_sha256=asset.sha256, image_size=asset.size, image_mime=asset.mime_type, image_data=None)
+                if row.pdf_data is not None:
+                    asset = store.save(io.BytesIO(row.pdf_data), "application/pdf")
+                    values.update(pdf_sha256=asset.sha256, pdf_size=asset.size, pdf_mime=asset.mime_type, pdf_data=None)
+                db.query(models.Book).filter(models.Book.id == book_id).update(values, synchronize_session=False)
+            db.commit()
+            db.expunge_all()
+            moved += len(ids)
+            last_id = ids[-1]
+            print(f"moved assets for {moved} books")
+    finally:
+        db.close()
+    print("done; run VACUUM (FULL) books to return the freed space to the OS")
+
+
+def build_derivatives(workers: int, batch_size: int):
+    """Build thumbnails / WebP / placeholders for covers that do not have them yet.
+
+    Covers still stored in-row need backfill-assets first.
+    """
+    db = SessionLocal()
+    built = failed = 0
+    last_id = None
+    pool = tasks.ProcessPool(workers)
+    try:
+        while True:
+            query = db.query(models.Book.id, models.Book.image_sha256).filter(
+                models.Book.image_sha256.isnot(None), models.Book.image_lqip.is_(None)
+            )
+            if last_id is not None:
+                query = query.filter(models.Book.id > last_id)
+            rows = query.order_by(models.Book.id).limit(batch_size).all()
+            if not rows:
+                break
+            futures = [(row.id, pool.get().submit(imaging.build_derivatives, row.image_sha256)) for row in rows]
+            for book_id, future in futures:
+                try:
+                    imaging.save_result(db, book_id, future.result())
+                    built += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"book {book_id}: {e}")
+            db.commit()
+            last_id = rows[-1].id
+            print(f"built derivatives for {built} books ({failed} failed)")
+    finally:
+        pool.shutdown(wait=True)
+        db.close()
+
+
+# ------------------------
+# AUTH
+# ------------------------
+
+def purge_refresh_tokens(batch_size: int):
+    """Delete expired refresh tokens (the API also does this hourly)."""
+    print(f"deleted {auth.purge_refresh_tokens(batch_size)} expired refresh tokens")
+
+
+def purge_idempotency_keys(batch_size: int):
+    """Delete expired idempotency keys (the API also does this hourly)."""
+    print(f"deleted {idempotency.purge_expired(batch_size)} expired idempotency keys")
+
+
+# ------------------------
+# RATINGS
+# ------------------------
+
+def reconcile_ratings():
+    """Recompute books.rating_sum / rating_count / average_rating from the ratings table."""
+    db = SessionLocal()
+    try:
+        print(f"corrected rating aggregates of {crud.reconcile_ratings(db)} books")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill-assets", help="move in-row blobs into the asset store")
+    backfill.add_argument("--batch-size", type=int, default=100)
+
+    derivatives = subparsers.add_parser("build-derivatives", help="build cover thumbnails in parallel")
+    derivatives.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    derivatives.add_argument("--batch-size", type=int, default=100)
+
+    purge = subparsers.add_parser("purge-refresh-tokens", help="delete expired refresh tokens")
+    purge.add_argument("--batch-size", type=int, default=5000)
+
+    purge_keys = subparsers.add_parser("purge-idempotency-keys", help="delete expired idempotency keys")
+    purge_keys.add_argument("--batch-size", type=int, default=5000)
+
+    subparsers.add_parser("reconcile-ratings", help="recompute rating aggregates from the ratings table")
+
+    args = parser.parse_args()
+    if args.command == "backfill-assets":
+        backfill_assets(args.batch_size)
+    elif args.command == "build-derivatives":
+        build_derivatives(args.workers, args.batch_size)
+    elif args.command == "purge-refresh-tokens":
+        purge_refresh_tokens(args.batch_size)
+    elif args.command == "purge-idempotency-keys":
+        purge_idempotency_keys(args.batch_size)
+    elif args.command == "reconcile-ratings":
+        reconcile_ratings()
+
+
+if __name__ == "__main__":
+    main()
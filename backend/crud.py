@@ -1,5 +1,7 @@
-from sqlalchemy.orm import Session
-import models, schemas
+from sqlalchemy import func, and_, or_, case, cast, select, update, Float, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, selectinload
+import models, schemas, pagination
 from auth import get_password_hash
 from uuid import UUID
 
@@ -30,6 +32,78 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_books(db: Session):
     return db.query(models.Book).all()
 
+STARS = range(1, 6)
+# books.rating_1 .. rating_5, the denormalized star histogram
+RATING_HISTOGRAM_COLUMNS = tuple(getattr(models.Book, f"rating_{star}") for star in STARS)
+
+# Card columns only: never touches image_data / pdf_data
+CATALOG_COLUMNS = (
+    models.Book.id,
+    models.Book.title,
+    models.Book.author,
+    models.Book.price,
+    models.Book.description,
+    models.Book.average_rating,
+    models.Book.rating_count,
+    *RATING_HISTOGRAM_COLUMNS,
+    models.Book.created_at,
+    models.Book.updated_at,
+    models.Book.image_sha256,
+    models.Book.image_lqip,
+    models.Book.image_size,
+    models.Book.pdf_size,
+    (func.coalesce(models.Book.pdf_size, 0) > 0).label("has_pdf"),
+)
+
+# Each sort key is paired with id as a tie-breaker; ix_books_<key>_id serves both directions
+BOOK_SORT_COLUMNS = {
+    "title": models.Book.title,
+    "author": models.Book.author,
+    "price": models.Book.price,
+    "created_at": models.Book.created_at,
+    "average_rating": models.Book.average_rating,
+}
+
+def get_catalog_page(db: Session, sort: str, descending: bool, limit: int, cursor: str = None):
+    columns = (BOOK_SORT_COLUMNS[sort], models.Book.id)
+    after = pagination.decode_cursor(cursor, sort, descending, columns) if cursor else None
+    rows = pagination.seek(db.query(*CATALOG_COLUMNS), columns, descending, limit, after).all()
+    return pagination.page(rows, limit, sort, descending, key=lambda row: (getattr(row, sort), row.id))
+
+def search_clauses(term: str):
+    """(rank, match) expressions for a normalized search term."""
+    document = func.to_tsvector(literal_column("'simple'"), models.Book.search_text)
+    query = func.websearch_to_tsquery(literal_column("'simple'"), term)
+    # float8 so the rank survives the cursor round trip exactly
+    rank = cast(func.word_similarity(term, models.Book.search_text) + func.ts_rank(document, query), Float(precision=53))
+    # search_text %> term is the index-backed form of word_similarity(term, search_text) > threshold
+    match = or_(models.Book.search_text.op("%>")(term), document.op("@@")(query))
+    return rank, match
+
+def search_books(db: Session, q: str, limit: int, cursor: str = None):
+    term = q.strip().lower()
+    rank, match = search_clauses(term)
+    columns = (rank, models.Book.id)
+    # The cursor is bound to the search term, so it cannot be replayed against another query
+    sort = f"search:{term}"
+    after = pagination.decode_cursor(cursor, sort, True, columns) if cursor else None
+    matches = db.query(*CATALOG_COLUMNS, rank.label("rank")).filter(match)
+    rows = pagination.seek(matches, columns, True, limit, after).all()
+    return pagination.page(rows, limit, sort, True, key=lambda row: (row.rank, row.id))
+
+def rating_histogram(row) -> list:
+    return [getattr(row, f"rating_{star}") for star in STARS]
+
+def to_book(row) -> schemas.Book:
+    return schemas.Book(
+        **row._mapping,
+        image_url=models.image_url(row.id, row.image_sha256, row.updated_at),
+        rating_histogram=rating_histogram(row),
+    )
+
+def get_catalog_book(db: Session, book_id: UUID):
+    return db.query(*CATALOG_COLUMNS).filter(models.Book.id == book_id).first()
+
 def create_book(db: Session, book: schemas.BookCreate):
     db_book = models.Book(
         title=book.title,
@@ -60,43 +134,312 @@ def delete_book(db: Session, db_book: models.Book):
 # ORDER LOGIC
 # ------------------------
 
-def create_order(db: Session, user_id: str, order_data: schemas.OrderCreate):
-    order = models.Order(user_id=user_id)
-    db.add(order)
-    db.flush()  # Get the order.id before committing
+def create_order(db: Session, user_id: UUID, order_data: schemas.OrderCreate):
+    """Place an order and return its OrderOut payload; the caller commits.
 
-    for item in order_data.items:
-        db_item = models.OrderItem(
-            order_id=order.id,
-            book_id=item.book_id,
-            title=item.title,
-            price=item.price,
-            quantity=item.quantity,
-        )
-        db.add(db_item)
+    Titles and prices come from the catalog (one IN query for every book_id),
+    never from the client, and the items go in as one multi-row
+    INSERT ... RETURNING, so nothing needs a refresh afterwards and the whole
+    order commits as one transaction. Returns None if any book does not exist.
+    """
+    book_ids = {item.book_id for item in order_data.items}
+    books = {
+        row.id: row
+        for row in db.query(models.Book.id, models.Book.title, models.Book.price).filter(models.Book.id.in_(book_ids))
+    }
+    if len(books) != len(book_ids):
+        return None
 
-    db.commit()
-    db.refresh(order)
-    return order
+    order = db.execute(
+        insert(models.Order)
+        .values(user_id=user_id)
+        .returning(models.Order.id, models.Order.status, models.Order.created_at)
+    ).one()
+    # executemany + RETURNING: SQLAlchemy batches the rows into multi-row
+    # VALUES statements (insertmanyvalues) instead of one INSERT per item
+    items = db.execute(
+        insert(models.OrderItem).returning(
+            models.OrderItem.book_id, models.OrderItem.title, models.OrderItem.price, models.OrderItem.quantity,
+            sort_by_parameter_order=True,
+        ),
+        [
+            {
+                "order_id": order.id,
+                "book_id": item.book_id,
+                "title": books[item.book_id].title,
+                "price": books[item.book_id].price,
+                "quantity": item.quantity,
+            }
+            for item in order_data.items
+        ],
+    ).all()
+    return {"id": order.id, "status": order.status, "created_at": order.created_at, "items": items}
+
+# Newest first, id as tie-breaker; ix_orders_user_id_created_at_id serves each page
+ORDER_PAGE_COLUMNS = (models.Order.created_at, models.Order.id)
 
-def get_user_orders(db: Session, user_id: str):
-    return db.query(models.Order).filter(models.Order.user_id == user_id).all()
+# Summary rows: per-order aggregates as correlated subqueries, evaluated only for the page's rows
+ORDER_SUMMARY_COLUMNS = (
+    models.Order.id,
+    models.Order.status,
+    models.Order.created_at,
+    models.Order.processed_at,
+    models.Order.shipped_at,
+    models.Order.delivered_at,
+    select(func.count(models.OrderItem.id))
+    .where(models.OrderItem.order_id == models.Order.id)
+    .scalar_subquery()
+    .label("item_count"),
+    select(func.coalesce(func.sum(models.OrderItem.price * models.OrderItem.quantity), 0))
+    .where(models.OrderItem.order_id == models.Order.id)
+    .scalar_subquery()
+    .label("total"),
+)
+
+def get_user_orders(db: Session, user_id: UUID, limit: int, cursor: str = None, summary: bool = False):
+    """One keyset page of a user's orders, newest first: full orders with items, or summary rows."""
+    after = pagination.decode_cursor(cursor, "orders", True, ORDER_PAGE_COLUMNS) if cursor else None
+    if summary:
+        query = db.query(*ORDER_SUMMARY_COLUMNS)
+    else:
+        query = db.query(models.Order).options(selectinload(models.Order.items))
+    rows = pagination.seek(query.filter(models.Order.user_id == user_id), ORDER_PAGE_COLUMNS, True, limit, after).all()
+    return pagination.page(rows, limit, "orders", True, key=lambda row: (row.created_at, row.id))
 
 def get_order_by_id(db: Session, order_id: str):
     return db.query(models.Order).filter(models.Order.id == order_id).first()
 
 
+# ------------------------
+# RATING LOGIC
+# ------------------------
+# books.rating_sum / rating_count and the rating_1..5 star histogram are
+# maintained incrementally: each rating applies its delta with one
+# UPDATE ... RETURNING on the book row, so rating a
+# book costs the same however many ratings it has. The book row lock
+# serializes concurrent raters of the same book. `python commands.py
+# reconcile-ratings` recomputes every book from the ratings table.
 
+def _book_average(total, count):
+    return func.coalesce(cast(total, Float) / func.nullif(count, 0), 0)
 
+def rate_book(db: Session, user_id: UUID, book_id: UUID, score: float):
+    """Insert or change a user's rating and apply the delta to the book; the caller commits.
 
-def add_to_cart(db: Session, user_id: UUID, item: schemas.CartItemCreate):
-    existing = db.query(models.CartItem).filter_by(user_id=user_id, book_id=item.book_id).first()
-    if existing:
-        existing.quantity += item.quantity
+    Returns (rating row, book aggregates row).
+    """
+    mine = (models.Rating.user_id == user_id, models.Rating.book_id == book_id)
+    previous = db.query(models.Rating.id, models.Rating.score).filter(*mine).with_for_update().first()
+    rating = None
+    if previous is None:
+        rating = db.execute(
+            insert(models.Rating)
+            .values(user_id=user_id, book_id=book_id, score=score)
+            .on_conflict_do_nothing(index_elements=[models.Rating.user_id, models.Rating.book_id])
+            .returning(models.Rating.id, models.Rating.user_id, models.Rating.book_id, models.Rating.score)
+        ).first()
+        if rating is None:
+            # A concurrent first rating by the same user won the insert: re-rate it instead
+            previous = db.query(models.Rating.id, models.Rating.score).filter(*mine).with_for_update().first()
+    if rating is None:
+        rating = db.execute(
+            update(models.Rating)
+            .where(models.Rating.id == previous.id)
+            .values(score=score)
+            .returning(models.Rating.id, models.Rating.user_id, models.Rating.book_id, models.Rating.score)
+        ).first()
+        # Scores are stored as integers: take deltas from what was stored, not from the request
+        sum_delta, count_delta = rating.score - previous.score, 0
     else:
-        cart_item = models.CartItem(user_id=user_id, book_id=item.book_id, quantity=item.quantity)
-        db.add(cart_item)
+        sum_delta, count_delta = rating.score, 1
+
+    histogram = {}
+    if previous is not None and previous.score != rating.score:
+        histogram[f"rating_{previous.score}"] = getattr(models.Book, f"rating_{previous.score}") - 1
+    if previous is None or previous.score != rating.score:
+        histogram[f"rating_{rating.score}"] = getattr(models.Book, f"rating_{rating.score}") + 1
+
+    book = db.execute(
+        update(models.Book)
+        .where(models.Book.id == book_id)
+        .values(
+            rating_sum=models.Book.rating_sum + sum_delta,
+            rating_count=models.Book.rating_count + count_delta,
+            average_rating=_book_average(models.Book.rating_sum + sum_delta, models.Book.rating_count + count_delta),
+            **histogram,
+        )
+        .returning(models.Book.rating_sum, models.Book.rating_count, models.Book.average_rating, *RATING_HISTOGRAM_COLUMNS)
+    ).first()
+    return rating, book
+
+MAX_RATINGS_IDS = 100
+
+def parse_book_ids(ids: str) -> list:
+    """Comma-separated book ids from a query string, deduplicated; ValueError if malformed."""
+    book_ids = list(dict.fromkeys(part.strip() for part in ids.split(",") if part.strip()))
+    if not book_ids:
+        raise ValueError("ids must list at least one book id")
+    if len(book_ids) > MAX_RATINGS_IDS:
+        raise ValueError(f"at most {MAX_RATINGS_IDS} ids per request")
+    try:
+        return [UUID(book_id) for book_id in book_ids]
+    except ValueError:
+        raise ValueError("ids must be comma-separated book UUIDs")
+
+def to_book_ratings(row) -> schemas.BookRatings:
+    return schemas.BookRatings(
+        book_id=row.id,
+        average_rating=row.average_rating,
+        rating_count=row.rating_count,
+        rating_histogram=rating_histogram(row),
+    )
+
+BOOK_RATINGS_COLUMNS = (models.Book.id, models.Book.average_rating, models.Book.rating_count, *RATING_HISTOGRAM_COLUMNS)
+
+def get_book_ratings(db: Session, book_ids):
+    """Rating aggregates and star histograms for many books, by primary key."""
+    return (
+        db.query(*BOOK_RATINGS_COLUMNS)
+        .filter(models.Book.id.in_(book_ids))
+        .all()
+    )
+
+def reconcile_ratings(db: Session) -> int:
+    """Recompute every book's rating aggregates and histogram with one GROUP BY; returns the number of books corrected."""
+    totals = (
+        select(
+            models.Rating.book_id,
+            func.sum(models.Rating.score).label("total"),
+            func.count().label("n"),
+            *[func.count().filter(models.Rating.score == star).label(f"rating_{star}") for star in STARS],
+        )
+        .group_by(models.Rating.book_id)
+        .subquery()
+    )
+    histogram = {f"rating_{star}": totals.c[f"rating_{star}"] for star in STARS}
+    corrected = db.execute(
+        update(models.Book)
+        .where(models.Book.id == totals.c.book_id)
+        .where(or_(
+            models.Book.rating_sum != totals.c.total,
+            models.Book.rating_count != totals.c.n,
+            *[getattr(models.Book, name) != column for name, column in histogram.items()],
+        ))
+        .values(
+            rating_sum=totals.c.total,
+            rating_count=totals.c.n,
+            average_rating=_book_average(totals.c.total, totals.c.n),
+            **histogram,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    unrated = ~select(models.Rating.id).where(models.Rating.book_id == models.Book.id).exists()
+    corrected += db.execute(
+        update(models.Book)
+        .where(or_(models.Book.rating_sum != 0, models.Book.rating_count != 0, *[column != 0 for column in RATING_HISTOGRAM_COLUMNS]), unrated)
+        .values(rating_sum=0, rating_count=0, average_rating=0, **{f"rating_{star}": 0 for star in STARS})
+        .execution_options(synchronize_session=False)
+    ).rowcount
     db.commit()
+    return corrected
+
+
+
+
+
+# ------------------------
+# CART LOGIC
+# ------------------------
+# One row per (user_id, book_id), enforced by ix_cart_items_user_id_book_id.
+# Quantity changes are applied by the database in a single
+# INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so concurrent adds from
+# several tabs all land instead of overwriting each other's read-modify-write.
+
+def _upsert_cart_lines(db: Session, user_id: UUID, quantities: dict, replace=frozenset()) -> dict:
+    """One multi-row upsert; adds each quantity to its line, or sets it for book ids in replace.
+
+    Returns {book_id: new quantity}. Rows go in book_id order, so concurrent
+    batches over the same lines take their row locks in the same order and
+    cannot deadlock each other.
+    """
+    statement = insert(models.CartItem).values([
+        {"user_id": user_id, "book_id": book_id, "quantity": quantities[book_id]} for book_id in sorted(quantities)
+    ])
+    added = models.CartItem.quantity + statement.excluded.quantity
+    quantity = case((statement.excluded.book_id.in_(replace), statement.excluded.quantity), else_=added) if replace else added
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.CartItem.user_id, models.CartItem.book_id],
+        set_={"quantity": quantity},
+    )
+    return dict(db.execute(statement.returning(models.CartItem.book_id, models.CartItem.quantity)).all())
+
+
+def _drop_cart_lines(db: Session, user_id: UUID, emptied):
+    # Only lines still <= 0 are deleted: they were just written (and locked)
+    # by this transaction's upsert, and the guard never removes a positive
+    # quantity. (A data-modifying CTE cannot delete the rows its own upsert
+    # just wrote.) Targets are locked in book_id order, like the upsert.
+    condition = and_(
+        models.CartItem.user_id == user_id,
+        models.CartItem.book_id.in_(emptied),
+        models.CartItem.quantity <= 0,
+    )
+    targets = select(models.CartItem.id).where(condition).order_by(models.CartItem.book_id).with_for_update()
+    db.query(models.CartItem).filter(models.CartItem.id.in_(targets), condition).delete(synchronize_session=False)
+
+
+def add_to_cart(db: Session, user_id: UUID, book_id: UUID, quantity: int) -> int:
+    """Add quantity (negative to take away) to the user's cart line; returns the new quantity, 0 if removed.
+
+    The caller commits. A nonexistent book surfaces as an IntegrityError.
+    """
+    total = _upsert_cart_lines(db, user_id, {book_id: quantity})[book_id]
+    if total > 0:
+        return total
+    _drop_cart_lines(db, user_id, [book_id])
+    return 0
+
+
+def apply_cart_ops(db: Session, user_id: UUID, ops):
+    """Apply a batch of schemas.CartOp with one upsert (and a delete if lines empty); the caller commits.
+
+    Ops on the same book are folded in order first, so every book is written
+    once: a set followed by deltas is a set, anything followed by a set is
+    that set. All lines go through a single statement, so the batch takes its
+    row locks in one sorted pass. A nonexistent book surfaces as an IntegrityError.
+    """
+    deltas, sets = {}, {}
+    for op in ops:
+        if op.set_quantity is not None:
+            deltas.pop(op.book_id, None)
+            sets[op.book_id] = op.set_quantity
+        elif op.book_id in sets:
+            sets[op.book_id] += op.delta
+        else:
+            deltas[op.book_id] = deltas.get(op.book_id, 0) + op.delta
+
+    quantities = {book_id: delta for book_id, delta in deltas.items() if delta}
+    quantities.update(sets)
+    if not quantities:
+        return
+    totals = _upsert_cart_lines(db, user_id, quantities, replace=frozenset(sets))
+    emptied = [book_id for book_id, quantity in totals.items() if quantity <= 0]
+    if emptied:
+        _drop_cart_lines(db, user_id, emptied)
+
+
+# schemas.CartLine, shared with async_crud.get_cart
+CART_LINE_COLUMNS = (models.Book.id, models.Book.title, models.Book.author, models.Book.price, models.CartItem.quantity)
+
+def get_cart_lines(db: Session, user_id: UUID):
+    """The user's cart with book details, in one join, in the order lines were added."""
+    return (
+        db.query(*CART_LINE_COLUMNS)
+        .join(models.CartItem.book)
+        .filter(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+        .all()
+    )
 
 
 def get_cart_items(db: Session, user_id: UUID):
@@ -113,11 +456,9 @@ def get_cart_items(db: Session, user_id: UUID):
     return result
 
 
-def remove_cart_item(db: Session, user_id: UUID, book_id: UUID):
-    item = db.query(models.CartItem).filter_by(user_id=user_id, book_id=book_id).first()
-    if item:
-        db.delete(item)
-        db.commit()
+def remove_cart_item(db: Session, user_id: UUID, book_id: UUID) -> bool:
+    """Drop the cart line with one DELETE; the caller commits."""
+    return db.query(models.CartItem).filter_by(user_id=user_id, book_id=book_id).delete(synchronize_session=False) > 0
 
 
 def clear_cart(db: Session, user_id: UUID):
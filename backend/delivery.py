@@ -0,0 +1,116 @@
+import re
+from typing import Callable, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+# ------------------------
+# ASSET DELIVERY (HTTP Range / conditional requests)
+# ------------------------
+# Bodies are streamed chunk by chunk from a read_range(start, end) callable, so
+# memory per download is bounded by the chunk size whatever the asset size.
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive (start, end) of a single byte range.
+
+    Returns None for anything we do not serve as a range (malformed or
+    multi-range headers), in which case the full body is sent.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _etag_matches(header: str, etag: Optional[str]) -> bool:
+    if not etag:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(request: Request, etag: Optional[str], headers: Optional[dict] = None) -> Optional[Response]:
+    """304 for a matching If-None-Match, checked before any body is read."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={**(headers or {}), "ETag": etag})
+    return None
+
+
+def asset_response(
+    request: Request,
+    *,
+    size: int,
+    media_type: str,
+    read_range: Callable[[int, int], Iterator[bytes]],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    base_headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    if etag:
+        base_headers["ETag"] = etag
+    if last_modified:
+        base_headers["Last-Modified"] = last_modified
+
+    cached = not_modified(request, etag, base_headers)
+    if cached is not None:
+        return cached
+
+    range_header = request.headers.get("range")
+    if range_header and size > 0:
+        # If-Range: only honour the range while the client's copy is current
+        if_range = request.headers.get("if-range")
+        honour = if_range is None or (etag is not None and if_range.strip() == etag) or (
+            last_modified is not None and if_range.strip() == last_modified
+        )
+        if honour:
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                return StreamingResponse(
+                    read_range(start, end),
+                    status_code=206,
+                    media_type=media_type,
+                    headers={
+                        **base_headers,
+                        "Content-Range": f"bytes {start}-{end}/{size}",
+                        "Content-Length": str(end - start + 1),
+                    },
+                )
+
+    return StreamingResponse(
+        read_range(0, size - 1),
+        media_type=media_type,
+        headers={**base_headers, "Content-Length": str(size)},
+    )
+
+
+def bytes_reader(data: bytes) -> Callable[[int, int], Iterator[bytes]]:
+    """read_range over an in-memory blob (legacy rows not yet backfilled)."""
+    def read_range(start: int, end: int) -> Iterator[bytes]:
+        yield data[start:end + 1]
+    return read_range
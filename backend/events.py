@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import metrics
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# EVENT HUB (server-sent events)
+# ------------------------
+# In-process pub/sub: each open event stream subscribes an asyncio.Queue
+# under a topic (an order id) and publishers fan events out to it from any
+# thread. An idle subscriber is just a queue and a suspended generator, with
+# no DB connection or thread, so a worker holds thousands of them cheaply.
+# Events carry a monotonically increasing "seq", sent as the SSE id: a client
+# that reconnects with Last-Event-ID only receives what it has not seen.
+#
+# Other worker processes learn about events through Postgres NOTIFY when it
+# is available (PgListener below); otherwise events only reach subscribers in
+# the publishing process.
+
+CHANNEL = "order_events"
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._count = 0
+
+        self.published = metrics.counter("events_published_total", "Events published to the in-process hub")
+        metrics.gauge("events_subscribers", "Open event streams", lambda: self._count)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Deliver events on this loop (the one serving the streams)."""
+        self._loop = loop
+
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(queue)
+            self._count += 1
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(topic)
+            if queues is None or queue not in queues:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[topic]
+            self._count -= 1
+
+    def publish(self, topic: str, event: dict):
+        """Thread-safe: hand the event to every subscriber of topic."""
+        self.published.inc()
+        with self._lock:
+            queues = list(self._subscribers.get(topic, ()))
+        if queues and self._loop is not None:
+            self._loop.call_soon_threadsafe(_deliver, queues, event)
+
+    def publish_many(self, batch: Iterable[dict]):
+        for event in batch:
+            self.publish(event["id"], event)
+
+
+def _deliver(queues, event):
+    for queue in queues:
+        queue.put_nowait(event)
+
+
+hub = EventHub()
+
+
+def format_sse(event: dict, name: str = "status") -> str:
+    return f"id: {event['seq']}\nevent: {name}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream(topic: str, queue: asyncio.Queue, snapshot: dict, last_seq: int, is_final: Callable[[dict], bool]):
+    """SSE body for one subscriber: the snapshot if it is newer than last_seq, then live events.
+
+    The caller subscribed before reading the snapshot, so nothing published in
+    between is lost; events at or below the last sent seq are skipped. A
+    comment line is sent every heartbeat interval to keep proxies from closing
+    an idle stream. The stream ends after a final event.
+    """
+    try:
+        yield f"retry: {settings.order_events_retry_ms}\n\n"
+        event = snapshot
+        while True:
+            if event is not None and event["seq"] > last_seq:
+                last_seq = event["seq"]
+                yield format_sse(event)
+                if is_final(event):
+                    return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.order_events_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                event = None
+                yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(topic, queue)
+
+
+def last_event_id(header: Optional[str]) -> int:
+    try:
+        return int(header) if header else 0
+    except ValueError:
+        return 0
+
+
+# ------------------------
+# CROSS-PROCESS DELIVERY (Postgres LISTEN / NOTIFY)
+# ------------------------
+
+def notify(db: Session, batch: list) -> bool:
+    """Queue NOTIFYs for batch in db's transaction (sent on commit); False if NOTIFY is not in use.
+
+    Every process, the sender included, receives them through its PgListener,
+    so a False return means the caller must hub.publish_many() after commit.
+    """
+    if not batch or not settings.order_events_notify or db.get_bind().dialect.name != "postgresql":
+        return False
+    db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": CHANNEL, "payloads": [json.dumps(event) for event in batch]},
+    )
+    return True
+
+
+class PgListener:
+    """LISTEN on CHANNEL from the event loop and republish each notification into the hub.
+
+    Uses one dedicated connection (detached from the pool) watched with
+    loop.add_reader, so it costs no thread. On a connection error it
+    reconnects after a delay; clients that miss events meanwhile catch up
+    from the snapshot when their stream reconnects.
+    """
+
+    def __init__(self, engine, reconnect_delay: float = 5):
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay
+        self._loop = None
+        self._conn = None
+        self._fd = None
+        self._stopped = False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._connect()
+
+    def _connect(self):
+        if self._stopped:
+            return
+        try:
+            pooled = self.engine.raw_connection()
+            pooled.detach()
+            conn = pooled.dbapi_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        except Exception:
+            logger.exception("could not LISTEN on %s; retrying in %ss", CHANNEL, self.reconnect_delay)
+            self._loop.call_later(self.reconnect_delay, self._connect)
+            return
+        self._conn, self._fd = conn, conn.fileno()
+        self._loop.add_reader(self._fd, self._drain)
+
+    def _drain(self):
+        try:
+            self._conn.poll()
+        except Exception:
+            logger.warning("lost the %s listener connection; reconnecting", CHANNEL)
+            self._close()
+            self._loop.call_later(self.reconnect_delay, self._connect)
+            return
+        while self._conn.notifies:
+            payload = self._conn.notifies.pop(0).payload
+            try:
+                event = json.loads(payload)
+            except ValueError:
+                logger.warning("ignoring malformed %s payload", CHANNEL)
+                continue
+            hub.publish(event["id"], event)
+
+    def _close(self):
+        if self._conn is not None:
+            self._loop.remove_reader(self._fd)
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = self._fd = None
+
+    def stop(self):
+        self._stopped = True
+        if self._loop is not None:
+            self._close()
@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select, update
+
+import events
+import metrics
+import models
+from config import settings
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# ORDER STATUS PROGRESSION
+# ------------------------
+# Orders move placed -> processed -> shipped -> delivered once they are old
+# enough. A periodic task advances every due order in set-based batches
+# (UPDATE ... WHERE status = ? AND created_at < ?, served by the
+# (status, created_at) index), so reading an order never writes it. Batches
+# are claimed with FOR UPDATE SKIP LOCKED: every worker process runs the
+# task, and they split the due rows instead of queueing on each other.
+
+# Each transition is published to the event hub for /orders/{id}/events.
+
+STATUSES = ("placed", "processed", "shipped", "delivered")
+
+# (from, to, timestamp column, minimum age since created_at)
+TRANSITIONS = (
+    ("placed", "processed", "processed_at", timedelta(minutes=1)),
+    ("processed", "shipped", "shipped_at", timedelta(minutes=2)),
+    ("shipped", "delivered", "delivered_at", timedelta(minutes=3)),
+)
+
+_advanced = {
+    target: metrics.counter("orders_advanced_total", "Orders moved to a new status by the scheduler", labels={"status": target})
+    for _, target, _, _ in TRANSITIONS
+}
+
+
+EVENT_COLUMNS = (
+    models.Order.id, models.Order.status, models.Order.processed_at, models.Order.shipped_at, models.Order.delivered_at,
+)
+
+
+def order_event(order) -> dict:
+    """Status event for an order (ORM object or EVENT_COLUMNS row); seq orders the statuses."""
+    return {
+        "id": str(order.id),
+        "status": order.status,
+        "seq": STATUSES.index(order.status) + 1 if order.status in STATUSES else 0,
+        "processed_at": order.processed_at.isoformat() if order.processed_at else None,
+        "shipped_at": order.shipped_at.isoformat() if order.shipped_at else None,
+        "delivered_at": order.delivered_at.isoformat() if order.delivered_at else None,
+    }
+
+
+def is_final(event: dict) -> bool:
+    return event["status"] == STATUSES[-1]
+
+
+def advance_orders(batch_size: Optional[int] = None) -> int:
+    """Advance every due order by one or more steps; returns the number of transitions made.
+
+    Transitions run in order, so an order that has been waiting long enough
+    catches up through several statuses in a single pass.
+    """
+    batch_size = batch_size or settings.order_progress_batch_size
+    total = 0
+    db = SessionLocal()
+    try:
+        for current, target, stamp, age in TRANSITIONS:
+            cutoff = datetime.now(timezone.utc) - age
+            while True:
+                due = (
+                    select(models.Order.id)
+                    .where(models.Order.status == current, models.Order.created_at < cutoff)
+                    .order_by(models.Order.created_at)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                    .scalar_subquery()
+                )
+                rows = db.execute(
+                    update(models.Order)
+                    .where(models.Order.id.in_(due))
+                    .values({models.Order.status: target, getattr(models.Order, stamp): func.now()})
+                    .returning(*EVENT_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                batch = [order_event(row) for row in rows]
+                notified = events.notify(db, batch)
+                db.commit()
+                if not notified:
+                    events.hub.publish_many(batch)
+                moved = len(rows)
+                _advanced[target].inc(moved)
+                total += moved
+                if moved < batch_size:
+                    break
+    finally:
+        db.close()
+    if total:
+        logger.info("advanced %d order(s)", total)
+    return total
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+import metrics
+import tasks
+from config import settings
+
+# ------------------------
+# PASSWORD HASHING
+# ------------------------
+# bcrypt is deliberately slow CPU work. Run in the request threadpool it holds
+# the GIL and a worker thread for its whole duration, so a login burst stalls
+# unrelated requests. Here it runs on a small process pool instead, and
+# admission is bounded: once hash_workers + hash_queue_limit calls are in
+# flight, new ones fail fast with HashingBusy (served as 503 + Retry-After)
+# rather than piling up threads behind the pool.
+
+# deprecated="auto": hashes with fewer rounds than bcrypt_rounds report needs_update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+
+class HashingBusy(Exception):
+    """The hashing pool and its queue are full."""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+_pool = tasks.ProcessPool(settings.hash_workers)
+_slots = threading.BoundedSemaphore(max(settings.hash_workers, 1) + settings.hash_queue_limit)
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+_rejected = metrics.counter("password_hash_rejected_total", "Hashing calls refused because the pool was saturated")
+_duration = metrics.histogram("password_hash_seconds", "Wall time of a hash / verify call, queueing included")
+metrics.gauge("password_hash_in_flight", "Hashing calls running or queued", lambda: _in_flight)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    return _pool.get()
+
+
+def shutdown():
+    _pool.shutdown()
+
+
+def _run(func, *args):
+    global _in_flight
+    inline = settings.hash_workers <= 0
+    # Inline mode hashes in the calling thread with no admission limit (the
+    # pre-pool behaviour), so it can serve as the baseline it is compared against
+    if not inline and not _slots.acquire(blocking=False):
+        _rejected.inc()
+        raise HashingBusy()
+    with _in_flight_lock:
+        _in_flight += 1
+    start = time.perf_counter()
+    try:
+        if inline:
+            return func(*args)
+        return get_pool().submit(func, *args).result()
+    finally:
+        _duration.observe(time.perf_counter() - start)
+        with _in_flight_lock:
+            _in_flight -= 1
+        if not inline:
+            _slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; on success also return a new hash if the stored one is outdated."""
+    return _run(_verify_and_update, password, hashed)
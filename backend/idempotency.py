@@ -0,0 +1,140 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+from config import settings
+from database import SessionLocal
+
+# ------------------------
+# IDEMPOTENCY KEYS
+# ------------------------
+# A client may send an Idempotency-Key header with a write. The first request
+# with a given key claims (user_id, key) by inserting a row in the same
+# transaction as its own writes, and stores its response in that row before
+# committing. So the key, the writes and the response become visible
+# together, or not at all if the request fails. A retry then finds the row
+# with one primary-key lookup and gets the stored response back (Replay)
+# without writing anything. A concurrent duplicate blocks on the unique key
+# until the first request commits, then replays it. Rows expire after
+# idempotency_key_ttl_hours and are purged in batches.
+
+_replayed = metrics.counter("idempotency_replays_total", "Writes answered from a stored idempotent response")
+
+
+class Replay(Exception):
+    """The request repeats a completed one; main.py serves the stored response."""
+
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self.body = body
+
+
+class Claim(NamedTuple):
+    user_id: UUID
+    key: str
+
+
+def fingerprint(method: str, path: str, payload=None) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+def _stored(db: Session, user_id: UUID, key: str):
+    return db.execute(
+        select(models.IdempotencyKey.fingerprint, models.IdempotencyKey.status_code, models.IdempotencyKey.response)
+        .where(
+            models.IdempotencyKey.user_id == user_id,
+            models.IdempotencyKey.key == key,
+            models.IdempotencyKey.expires_at > func.now(),
+        )
+    ).first()
+
+
+def _replay_or_reject(row, request_fingerprint: str):
+    if row is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    if row.fingerprint != request_fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if row.status_code is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    _replayed.inc()
+    raise Replay(row.status_code, row.response)
+
+
+def begin(db: Session, user_id: UUID, key: Optional[str], request_fingerprint: str) -> Optional[Claim]:
+    """Claim key for this request, or raise Replay if it already completed.
+
+    Returns None when the client sent no key. The claim is part of db's
+    current transaction: pass it to complete() before the endpoint commits.
+    """
+    if not key:
+        return None
+    row = _stored(db, user_id, key)
+    if row is not None:
+        _replay_or_reject(row, request_fingerprint)
+
+    now = datetime.now(timezone.utc)
+    values = dict(
+        user_id=user_id,
+        key=key,
+        fingerprint=request_fingerprint,
+        status_code=None,
+        response=None,
+        created_at=now,
+        expires_at=now + timedelta(hours=settings.idempotency_key_ttl_hours),
+    )
+    statement = insert(models.IdempotencyKey).values(**values)
+    # An expired row that has not been purged yet is taken over in place
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.IdempotencyKey.user_id, models.IdempotencyKey.key],
+        set_={name: statement.excluded[name] for name in values if name not in ("user_id", "key")},
+        where=models.IdempotencyKey.expires_at <= func.now(),
+    )
+    # Waits here while a concurrent request holding the same key is uncommitted
+    claimed = db.execute(statement.returning(models.IdempotencyKey.key)).first()
+    if claimed is None:
+        _replay_or_reject(_stored(db, user_id, key), request_fingerprint)
+    return Claim(user_id, key)
+
+
+def complete(db: Session, claim: Optional[Claim], body, status_code: int = 200):
+    """Store the response for claim; the caller's commit makes it visible with the writes."""
+    if claim is None:
+        return
+    db.query(models.IdempotencyKey).filter_by(user_id=claim.user_id, key=claim.key).update(
+        {"status_code": status_code, "response": jsonable_encoder(body)}, synchronize_session=False
+    )
+
+
+def purge_expired(batch_size: int = 5000) -> int:
+    """Delete expired idempotency keys in batches; returns the number removed."""
+    removed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            expired = (
+                select(models.IdempotencyKey.user_id, models.IdempotencyKey.key)
+                .where(models.IdempotencyKey.expires_at < func.now())
+                .limit(batch_size)
+            )
+            deleted = (
+                db.query(models.IdempotencyKey)
+                .filter(tuple_(models.IdempotencyKey.user_id, models.IdempotencyKey.key).in_(expired))
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+    finally:
+        db.close()
@@ -0,0 +1,144 @@
+import base64
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+import models
+from cache import catalog
+import storage
+import tasks
+from config import settings
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# COVER DERIVATIVES
+# ------------------------
+# Each uploaded cover gets fixed-width thumbnails in JPEG and WebP plus a tiny
+# blurred placeholder (LQIP). The work is CPU-bound, so it runs on a process
+# pool off the request path; results land in books.image_variants / image_lqip.
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Detect the real image type from its magic bytes."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def variant_key(width: int, fmt: str) -> str:
+    return f"{width}.{fmt}"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    # JPEG has no alpha channel: composite transparent covers onto white
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def build_derivatives(sha256: str) -> dict:
+    """Runs in a pool worker: read the original from the store, write variants back."""
+    store = storage.get_asset_store()
+    with store.open(sha256) as f:
+        mime_type = sniff_mime(f.read(32))
+        f.seek(0)
+        image = Image.open(f)
+        image.load()
+    image = _flatten(ImageOps.exif_transpose(image))
+
+    variants = {}
+    for width in settings.image_thumb_widths:
+        thumb = image
+        if image.width > width:
+            thumb = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt, (pil_format, variant_mime) in FORMATS.items():
+            buf = io.BytesIO()
+            thumb.save(buf, pil_format, quality=settings.image_thumb_quality)
+            buf.seek(0)
+            asset = store.save(buf, variant_mime)
+            variants[variant_key(width, fmt)] = {"sha256": asset.sha256, "size": asset.size, "mime": variant_mime}
+
+    tiny = image.copy()
+    tiny.thumbnail((settings.image_lqip_size, settings.image_lqip_size))
+    buf = io.BytesIO()
+    tiny.save(buf, "JPEG", quality=40)
+    lqip = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    return {"mime": mime_type, "variants": variants, "lqip": lqip}
+
+
+def pick_variant(variants: Optional[dict], width: int, accept: str) -> Optional[dict]:
+    """Smallest configured width >= the requested one, WebP when the client accepts it."""
+    if not variants:
+        return None
+    fmt = "webp" if "image/webp" in (accept or "") else "jpeg"
+    widths = sorted(settings.image_thumb_widths)
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return variants.get(variant_key(chosen, fmt))
+
+
+_pool = tasks.ProcessPool(settings.image_workers)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    return _pool.get()
+
+
+def shutdown():
+    _pool.shutdown()
+
+
+def save_result(db, book_id, result: dict):
+    values = {"image_variants": result["variants"], "image_lqip": result["lqip"]}
+    if result["mime"]:
+        values["image_mime"] = result["mime"]
+    db.query(models.Book).filter(models.Book.id == book_id).update(values, synchronize_session=False)
+
+
+def enqueue(book_id, sha256: str):
+    """Schedule derivative generation for a freshly uploaded cover."""
+    future = get_pool().submit(build_derivatives, sha256)
+
+    def done(f):
+        try:
+            result = f.result()
+        except Exception:
+            logger.exception("building derivatives for book %s failed", book_id)
+            return
+        db = SessionLocal()
+        try:
+            save_result(db, book_id, result)
+            db.commit()
+        finally:
+            db.close()
+        # New placeholder / thumbnails change the serialized book
+        catalog.invalidate_book(book_id)
+
+    future.add_done_callback(done)
+    return future
@@ -1,17 +1,52 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, Form, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, status, File, Form, UploadFile, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import Response
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Union
 from uuid import UUID
-from datetime import datetime, timedelta, timezone
-import models, schemas, auth, crud
-from database import SessionLocal, engine
+from datetime import timezone
+from email.utils import format_datetime
+from contextlib import asynccontextmanager
+import asyncio
+import models, schemas, auth, crud, storage, delivery, imaging, hashing, idempotency, metrics, tasks, events, fulfillment, async_routes
+from cache import catalog
+from config import settings
+from database import SessionRoute, engine, async_engine, get_db
 
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+token_version_refresh = tasks.PeriodicTask("token-versions", settings.token_version_refresh_seconds, auth.token_versions.refresh)
+refresh_token_purge = tasks.PeriodicTask("refresh-token-purge", settings.refresh_token_purge_seconds, auth.purge_refresh_tokens)
+idempotency_purge = tasks.PeriodicTask("idempotency-purge", settings.idempotency_purge_seconds, idempotency.purge_expired)
+order_progression = tasks.PeriodicTask("order-progression", settings.order_progress_seconds, fulfillment.advance_orders)
+order_listener = events.PgListener(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    events.hub.bind(asyncio.get_running_loop())
+    if settings.order_events_notify and engine.dialect.name == "postgresql":
+        order_listener.start(asyncio.get_running_loop())
+    await token_version_refresh.run_once()
+    token_version_refresh.start()
+    refresh_token_purge.start()
+    idempotency_purge.start()
+    order_progression.start()
+    yield
+    await order_progression.stop()
+    order_listener.stop()
+    await idempotency_purge.stop()
+    await refresh_token_purge.stop()
+    await token_version_refresh.stop()
+    imaging.shutdown()
+    hashing.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = SessionRoute
 
 # CORS
 app.add_middleware(
@@ -22,13 +57,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Login / registration bursts beyond the hashing pool's queue fail fast
+@app.exception_handler(hashing.HashingBusy)
+async def hashing_busy(request: Request, exc: hashing.HashingBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again shortly"}, headers={"Retry-After": "1"})
+
+# A retried write with a known Idempotency-Key gets the original response back
+@app.exception_handler(idempotency.Replay)
+async def idempotent_replay(request: Request, exc: idempotency.Replay):
+    return JSONResponse(status_code=exc.status_code, content=exc.body, headers={"Idempotent-Replayed": "true"})
+
+# Async read routes take precedence over the sync handlers below when enabled
+if settings.async_db:
+    app.include_router(async_routes.router)
 
 # Register user
 @app.post("/register", response_model=schemas.UserOut)
@@ -44,38 +85,82 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     user = auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    access_token = auth.create_access_token(data={"sub": user.username, "role": user.role})
-    return {"access_token": access_token, "token_type": "bearer"}
-
-# Get all books
-@app.get("/books", response_model=List[schemas.Book])
-def read_books(db: Session = Depends(get_db)):
-    books = db.query(models.Book).all()
-    return [
-        schemas.Book(
-            id=book.id,
-            title=book.title,
-            author=book.author,
-            price=book.price,
-            description=book.description,
-            has_pdf=bool(book.pdf_data)
-        ) for book in books
-    ]
+    access_token = auth.create_access_token(data=auth.token_claims(user))
+    refresh_token = auth.issue_refresh_token(db, user.id)
+    db.commit()
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# Renew the access token without the password; the refresh token is rotated
+@app.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    claims, refresh_token = auth.rotate_refresh_token(db, body.refresh_token)
+    access_token = auth.create_access_token(data=claims)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# Logout: revoke the refresh token and every rotation of it
+@app.post("/token/revoke")
+def revoke_refresh_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    auth.revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Refresh token revoked"}
+
+# Get books, one keyset page at a time (served from the catalog cache)
+@app.get("/books", response_model=schemas.BookPage)
+def read_books(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: schemas.BookSort = schemas.BookSort.title,
+    order: schemas.SortOrder = schemas.SortOrder.asc,
+    db: Session = Depends(get_db),
+):
+    def fill():
+        rows, next_cursor = crud.get_catalog_page(db, sort.value, order == schemas.SortOrder.desc, limit, cursor)
+        return schemas.BookPage(items=[crud.to_book(row) for row in rows], next_cursor=next_cursor).model_dump_json().encode()
+
+    try:
+        body = catalog.get_or_fill(catalog.list_key("books", sort.value, order.value, limit, cursor), fill)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+# Ranked, typo-tolerant search over title and author
+@app.get("/books/search", response_model=schemas.BookPage)
+def search_books(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    def fill():
+        rows, next_cursor = crud.search_books(db, q, limit, cursor)
+        return schemas.BookPage(items=[crud.to_book(row) for row in rows], next_cursor=next_cursor).model_dump_json().encode()
+
+    try:
+        body = catalog.get_or_fill(catalog.list_key("search", q.strip().lower(), limit, cursor), fill)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+
+# Rating aggregates and star histograms for many books at once (?ids=a,b,c)
+@app.get("/books/ratings", response_model=List[schemas.BookRatings])
+def read_book_ratings(ids: str = Query(..., max_length=4000), db: Session = Depends(get_db)):
+    try:
+        book_ids = crud.parse_book_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [crud.to_book_ratings(row) for row in crud.get_book_ratings(db, book_ids)]
 
 
 @app.get("/books/{book_id}", response_model=schemas.Book)
 def get_single_book(book_id: UUID, db: Session = Depends(get_db)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not book:
+    def fill():
+        book = crud.get_catalog_book(db, book_id)
+        return crud.to_book(book).model_dump_json().encode() if book else None
+
+    body = catalog.get_or_fill(catalog.book_key(book_id), fill)
+    if body is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return schemas.Book(
-        id=book.id,
-        title=book.title,
-        author=book.author,
-        price=book.price,
-        description=book.description,
-        has_pdf=bool(book.pdf_data)
-    )
+    return Response(content=body, media_type="application/json")
 
 
 
@@ -89,57 +174,139 @@ def create_book(
     image: UploadFile = File(...),
     pdf: UploadFile = File(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.admin_only),
+    current_user: auth.Principal = Depends(auth.admin_only),
 ):
-    image_data = image.file.read()
-    pdf_data = pdf.file.read() if pdf else None
+    store = storage.get_asset_store()
+    image_asset = store.save(image.file, image.content_type or "application/octet-stream")
+    pdf_asset = store.save(pdf.file, "application/pdf") if pdf else None
     db_book = models.Book(
         title=title,
         author=author,
         price=price,
         description=description,
-        image_data=image_data,
-        pdf_data=pdf_data,
+        image_sha256=image_asset.sha256,
+        image_size=image_asset.size,
+        image_mime=image_asset.mime_type,
+        pdf_sha256=pdf_asset.sha256 if pdf_asset else None,
+        pdf_size=pdf_asset.size if pdf_asset else None,
+        pdf_mime=pdf_asset.mime_type if pdf_asset else None,
     )
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    catalog.invalidate_listing()
+    # Thumbnails, WebP and the placeholder are built off the request path
+    imaging.enqueue(db_book.id, image_asset.sha256)
     return db_book
 
-# Get book image
+# Get book image. Served with a strong ETag; requests for the current
+# versioned URL (?v=, see Book.image_url) may be cached immutably.
+# ?w= picks the closest thumbnail, as WebP when the Accept header allows it.
 @app.get("/books/{book_id}/image")
-def get_book_image(book_id: str, db: Session = Depends(get_db)):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not db_book or not db_book.image_data:
+def get_book_image(
+    request: Request,
+    book_id: UUID,
+    v: Optional[str] = None,
+    w: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    columns = [models.Book.image_sha256, models.Book.image_mime, models.Book.image_size, models.Book.updated_at]
+    if w:
+        columns.append(models.Book.image_variants)
+    book = db.query(*columns).filter(models.Book.id == book_id).first()
+    if not book or not book.image_size:
         raise HTTPException(status_code=404, detail="Image not found")
-    return Response(content=db_book.image_data, media_type="image/jpeg")
+    version = models.image_version(book.image_sha256, book.updated_at)
+    variant = imaging.pick_variant(book.image_variants, w, request.headers.get("accept")) if w else None
+    # Variants do not change the version: while a ?w= request falls back to the
+    # original (not built yet), it must not be cached immutably under that URL
+    immutable = v == version and (variant is not None or not w)
+    headers = {"Cache-Control": settings.image_cache_control if immutable else "public, no-cache"}
+    if w:
+        headers["Vary"] = "Accept"
+    if variant:
+        store = storage.get_asset_store()
+        return delivery.asset_response(
+            request,
+            size=variant["size"],
+            media_type=variant["mime"],
+            read_range=lambda start, end: store.iter_range(variant["sha256"], start, end, settings.asset_stream_chunk_size),
+            etag=f'"{variant["sha256"]}"',
+            headers=headers,
+        )
+
+    etag = f'"{book.image_sha256}"' if book.image_sha256 else f'"u{version}"'
+    last_modified = format_datetime(book.updated_at.astimezone(timezone.utc), usegmt=True) if book.updated_at else None
+
+    # Revalidation is answered from the metadata row alone, before any blob is read
+    cached = delivery.not_modified(request, etag, headers)
+    if cached is not None:
+        return cached
+
+    if book.image_sha256:
+        store = storage.get_asset_store()
+        read_range = lambda start, end: store.iter_range(book.image_sha256, start, end, settings.asset_stream_chunk_size)
+        media_type = book.image_mime
+    else:
+        # Not yet moved out of Postgres by backfill-assets
+        image_data = db.query(models.Book.image_data).filter(models.Book.id == book_id).scalar()
+        read_range = delivery.bytes_reader(image_data)
+        media_type = "image/jpeg"
+    return delivery.asset_response(
+        request,
+        size=book.image_size,
+        media_type=media_type,
+        read_range=read_range,
+        etag=etag,
+        last_modified=last_modified,
+        headers=headers,
+    )
 
-# Get book PDF (with payment check)
+# Get book PDF (with payment check), streamed with Range / If-Range support
 @app.get("/books/{book_id}/pdf")
-def get_book_pdf(book_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not db_book or not db_book.pdf_data:
+def get_book_pdf(request: Request, book_id: UUID, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    book = db.query(models.Book.pdf_sha256, models.Book.pdf_size).filter(models.Book.id == book_id).first()
+    if not book or not book.pdf_size:
         raise HTTPException(status_code=404, detail="PDF not found")
 
     payment = db.query(models.Payment).filter_by(user_id=current_user.id, book_id=book_id).first()
     if not payment:
         raise HTTPException(status_code=403, detail="Payment required to access PDF")
 
-    return Response(content=db_book.pdf_data, media_type="application/pdf")
+    headers = {"Content-Disposition": "inline", "Cache-Control": "private, no-transform"}
+    if book.pdf_sha256:
+        store = storage.get_asset_store()
+        return delivery.asset_response(
+            request,
+            size=book.pdf_size,
+            media_type="application/pdf",
+            read_range=lambda start, end: store.iter_range(book.pdf_sha256, start, end, settings.asset_stream_chunk_size),
+            etag=f'"{book.pdf_sha256}"',
+            headers=headers,
+        )
+    pdf_data = db.query(models.Book.pdf_data).filter(models.Book.id == book_id).scalar()
+    return delivery.asset_response(
+        request,
+        size=len(pdf_data),
+        media_type="application/pdf",
+        read_range=delivery.bytes_reader(pdf_data),
+        headers=headers,
+    )
 
 # Delete book
 @app.delete("/books/{book_id}")
-def delete_book(book_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.admin_only)):
+def delete_book(book_id: UUID, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.admin_only)):
     db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
     db.delete(db_book)
     db.commit()
+    catalog.invalidate_book(book_id)
     return {"message": "Book deleted"}
 
 # Update book
 @app.put("/books/{book_id}", response_model=schemas.Book)
-def update_book(book_id: str, book: schemas.BookCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.admin_only)):
+def update_book(book_id: UUID, book: schemas.BookCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.admin_only)):
     db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
@@ -149,82 +316,112 @@ def update_book(book_id: str, book: schemas.BookCreate, db: Session = Depends(ge
     db_book.description = book.description
     db.commit()
     db.refresh(db_book)
+    catalog.invalidate_book(book_id)
     return db_book
 
+# Prometheus scrape endpoint (per worker process)
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Get current user info
 @app.get("/users/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+def read_users_me(current_user: auth.Principal = Depends(auth.get_current_user)):
     return current_user
 
 # Promote user
 @app.put("/users/{username}/make-admin")
-def make_admin(username: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def make_admin(username: str, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can promote users")
     user = db.query(models.User).filter(models.User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.role = "admin"
+    # Revoke tokens still claiming the old role
+    user.token_version += 1
     db.commit()
+    auth.token_versions.bump(user.id, user.token_version)
     return {"message": f"{username} is now an admin."}
 
 # Create order
 @app.post("/orders", response_model=schemas.OrderOut)
-def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    new_order = models.Order(user_id=current_user.id)
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-    for item in order.items:
-        db.add(models.OrderItem(order_id=new_order.id, book_id=item.book_id, title=item.title, price=item.price, quantity=item.quantity))
+def create_order(
+    order: schemas.OrderCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    claim = idempotency.begin(db, current_user.id, idempotency_key, idempotency.fingerprint("POST", request.url.path, order))
+    placed = crud.create_order(db, current_user.id, order)
+    if placed is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    idempotency.complete(db, claim, schemas.OrderOut.model_validate(placed, from_attributes=True))
     db.commit()
-    return new_order
-
-# Get my orders
-@app.get("/orders", response_model=List[schemas.OrderOut])
-def get_my_orders(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Order).filter(models.Order.user_id == current_user.id).all()
+    return placed
+
+# Get my orders, newest first, one keyset page at a time
+@app.get("/orders", response_model=Union[schemas.OrderPage, schemas.OrderSummaryPage])
+def get_my_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    try:
+        rows, next_cursor = crud.get_user_orders(db, current_user.id, limit, cursor, summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary:
+        return schemas.OrderSummaryPage.model_validate({"items": rows, "next_cursor": next_cursor}, from_attributes=True)
+    return schemas.OrderPage.model_validate({"items": rows, "next_cursor": next_cursor}, from_attributes=True)
 
 # Get single order
 @app.get("/orders/{order_id}", response_model=schemas.OrderOut)
 def get_order(order_id: str, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    order = db.query(models.Order).options(selectinload(models.Order.items)).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    now = datetime.now(timezone.utc)
-    elapsed = now - order.created_at
-    if order.status == "placed" and elapsed > timedelta(minutes=1):
-        order.status = "processed"
-    elif order.status == "processed" and elapsed > timedelta(minutes=2):
-        order.status = "shipped"
-    elif order.status == "shipped" and elapsed > timedelta(minutes=3):
-        order.status = "delivered"
-    db.commit()
+    # Status is advanced by fulfillment.advance_orders, not on read
     return order
 
+# Live order status (server-sent events)
+@app.get("/orders/{order_id}/events")
+def order_events(order_id: UUID, request: Request, db: Session = Depends(get_db)):
+    topic = str(order_id)
+    last_seq = events.last_event_id(request.headers.get("last-event-id"))
+    # Subscribe before reading the snapshot so no transition falls in between
+    queue = events.hub.subscribe(topic)
+    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    if not order:
+        events.hub.unsubscribe(topic, queue)
+        raise HTTPException(status_code=404, detail="Order not found")
+    snapshot = fulfillment.order_event(order)
+    if fulfillment.is_final(snapshot) and snapshot["seq"] <= last_seq:
+        # Client already saw the final status: 204 tells EventSource to stop reconnecting
+        events.hub.unsubscribe(topic, queue)
+        return Response(status_code=204)
+    return StreamingResponse(
+        events.stream(topic, queue, snapshot, last_seq, fulfillment.is_final),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Submit rating
 @app.post("/ratings", response_model=schemas.RatingOut)
-def create_rating(rating: schemas.RatingCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    book = db.query(models.Book).filter_by(id=rating.book_id).first()
-    if not book:
+def create_rating(rating: schemas.RatingCreate, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if not db.query(models.Book.id).filter_by(id=rating.book_id).first():
         raise HTTPException(status_code=404, detail="Book not found")
-    existing = db.query(models.Rating).filter_by(user_id=current_user.id, book_id=rating.book_id).first()
-    if existing:
-        existing.score = rating.score
-    else:
-        existing = models.Rating(user_id=current_user.id, book_id=rating.book_id, score=rating.score)
-        db.add(existing)
-    db.commit()
-    ratings = db.query(models.Rating).filter_by(book_id=rating.book_id).all()
-    average = sum(r.score for r in ratings) / len(ratings)
-    book.average_rating = average
-    book.rating_count = len(ratings)
+    saved, book = crud.rate_book(db, current_user.id, rating.book_id, rating.score)
     db.commit()
-    return {"id": existing.id, "book_id": existing.book_id, "user_id": existing.user_id, "score": existing.score, "average_rating": average, "rating_count": len(ratings)}
+    catalog.invalidate_book(rating.book_id)
+    return {"id": saved.id, "book_id": saved.book_id, "user_id": saved.user_id, "score": saved.score, "average_rating": book.average_rating, "rating_count": book.rating_count, "rating_histogram": crud.rating_histogram(book)}
 
 # Delete order
 @app.delete("/orders/{order_id}")
-def delete_order(order_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(auth.admin_only)):
+def delete_order(order_id: UUID, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.admin_only)):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -234,70 +431,88 @@ def delete_order(order_id: UUID, db: Session = Depends(get_db), current_user: mo
 
 # Payment endpoint
 @app.post("/pay/{book_id}")
-def pay_for_book(book_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def pay_for_book(
+    book_id: UUID,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    claim = idempotency.begin(db, current_user.id, idempotency_key, idempotency.fingerprint("POST", request.url.path))
     book = db.query(models.Book).filter_by(id=book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
-    existing = db.query(models.Payment).filter_by(user_id=current_user.id, book_id=book_id).first()
-    if existing:
+    # ix_payments_user_id_book_id makes a concurrent double payment a no-op instead of a duplicate row
+    paid = db.execute(
+        insert(models.Payment)
+        .values(user_id=current_user.id, book_id=book_id)
+        .on_conflict_do_nothing(index_elements=[models.Payment.user_id, models.Payment.book_id])
+        .returning(models.Payment.id)
+    ).first()
+    if paid is None:
         return {"message": "Already paid for this book."}
-    payment = models.Payment(user_id=current_user.id, book_id=book_id)
-    db.add(payment)
+    result = {"message": "Payment successful. You can now access the PDF."}
+    idempotency.complete(db, claim, result)
     db.commit()
-    return {"message": "Payment successful. You can now access the PDF."}
+    return result
 
 
 
 # Check if user has access (payment made) to book PDF
 @app.get("/books/{book_id}/access")
-def check_book_access(book_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def check_book_access(book_id: UUID, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     payment = db.query(models.Payment).filter_by(user_id=current_user.id, book_id=book_id).first()
     return {"has_access": bool(payment)}
 
 
 
 
-@app.get("/cart")
+@app.get("/cart", response_model=List[schemas.CartLine])
 def get_cart(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(auth.get_current_user)
 ):
-    items = (
-        db.query(models.CartItem)
-        .options(joinedload(models.CartItem.book))  # Eager load the book relation
-        .filter_by(user_id=current_user.id)
-        .all()
-    )
-
-    return [
-        {
-            "id": i.book_id,
-            "title": i.book.title,
-            "price": i.book.price,
-            "quantity": i.quantity
-        }
-        for i in items
-    ]
+    return [schemas.CartLine(**line._mapping) for line in crud.get_cart_lines(db, current_user.id)]
+
+# Apply a batch of cart changes in one transaction and return the new cart
+@app.patch("/cart", response_model=List[schemas.CartLine])
+def patch_cart(
+    patch: schemas.CartPatch,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    claim = idempotency.begin(db, current_user.id, idempotency_key, idempotency.fingerprint("PATCH", request.url.path, patch))
+    try:
+        crud.apply_cart_ops(db, current_user.id, patch.ops)
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="Book not found")
+    cart = [schemas.CartLine(**line._mapping) for line in crud.get_cart_lines(db, current_user.id)]
+    idempotency.complete(db, claim, cart)
+    db.commit()
+    return cart
 
 @app.post("/cart/add")
-def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    cart_item = db.query(models.CartItem).filter_by(user_id=current_user.id, book_id=item.book_id).first()
-    if cart_item:
-        cart_item.quantity += item.quantity
-        if cart_item.quantity <= 0:
-            db.delete(cart_item)
-        else:
-            db.add(cart_item)
-    else:
-        new_item = models.CartItem(user_id=current_user.id, **item.dict())
-        db.add(new_item)
+def add_to_cart(
+    item: schemas.CartItemCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    claim = idempotency.begin(db, current_user.id, idempotency_key, idempotency.fingerprint("POST", request.url.path, item))
+    try:
+        quantity = crud.add_to_cart(db, current_user.id, item.book_id, item.quantity)
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="Book not found")
+    result = {"message": "Cart updated", "book_id": item.book_id, "quantity": quantity}
+    idempotency.complete(db, claim, result)
     db.commit()
-    return {"message": "Cart updated"}
+    return result
 
 @app.delete("/cart/remove/{book_id}")
-def remove_from_cart(book_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    item = db.query(models.CartItem).filter_by(user_id=current_user.id, book_id=book_id).first()
-    if item:
-        db.delete(item)
+def remove_from_cart(book_id: UUID, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    if crud.remove_cart_item(db, current_user.id, book_id):
         db.commit()
     return {"message": "Item removed"}
@@ -0,0 +1,149 @@
+import bisect
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# ------------------------
+# IN-PROCESS METRICS
+# ------------------------
+# Minimal counters / gauges / histograms rendered in the Prometheus text
+# format at GET /metrics. Values are per worker process.
+
+_registry: Dict[Tuple[str, tuple], "Metric"] = {}
+_lock = threading.Lock()
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Optional[dict] = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(sorted((labels or {}).items()))
+
+    def samples(self):
+        raise NotImplementedError
+
+    def _labelled(self, name: str, extra: tuple = ()) -> str:
+        labels = self.labels + extra
+        if not labels:
+            return name
+        return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}"
+
+    def render(self) -> str:
+        return "\n".join(f"{name} {value}" for name, value in self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Optional[dict] = None):
+        super().__init__(name, help, labels)
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        return [(self._labelled(self.name), self._value)]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Optional[Callable[[], float]] = None, labels: Optional[dict] = None):
+        super().__init__(name, help, labels)
+        self._value = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    @property
+    def value(self):
+        return self._callback() if self._callback else self._value
+
+    def samples(self):
+        return [(self._labelled(self.name), self.value)]
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labels: Optional[dict] = None):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus +Inf; cumulated at render time
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples.append((self._labelled(f"{self.name}_bucket", (("le", le),)), cumulative))
+        samples.append((self._labelled(f"{self.name}_sum"), total))
+        samples.append((self._labelled(f"{self.name}_count"), cumulative))
+        return samples
+
+
+def _register(metric: Metric) -> Metric:
+    with _lock:
+        return _registry.setdefault((metric.name, metric.labels), metric)
+
+
+def counter(name: str, help: str, labels: Optional[dict] = None) -> Counter:
+    return _register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, callback: Optional[Callable[[], float]] = None, labels: Optional[dict] = None) -> Gauge:
+    return _register(Gauge(name, help, callback, labels))
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labels: Optional[dict] = None) -> Histogram:
+    return _register(Histogram(name, help, buckets, labels))
+
+
+def render() -> str:
+    with _lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    blocks = []
+    seen = set()
+    for metric in metrics:
+        # HELP / TYPE once per family, then one block of samples per label set
+        if metric.name not in seen:
+            seen.add(metric.name)
+            blocks.append(metric.header())
+        blocks.append(metric.render())
+    return "\n".join(blocks) + "\n"
@@ -1,27 +1,62 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Float, LargeBinary, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Float, LargeBinary, Integer, ForeignKey, Index, Computed, DDL, event, text, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from database import Base
 from sqlalchemy import Integer, ForeignKey
-from sqlalchemy.orm import relationship 
+from sqlalchemy.orm import relationship, deferred
+
+
+def image_version(image_sha256, updated_at) -> str:
+    # Changes whenever the cover does, so versioned image URLs can be cached forever
+    if image_sha256:
+        return image_sha256[:16]
+    return str(int(updated_at.timestamp())) if updated_at else "0"
+
+
+def image_url(book_id, image_sha256, updated_at) -> str:
+    return f"/books/{book_id}/image?v={image_version(image_sha256, updated_at)}"
+
 
 class Book(Base):
     __tablename__ = "books"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    title = Column(String, index=True, nullable=False)
-    author = Column(String, index=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    title = Column(String, nullable=False)
+    author = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     description = Column(String, nullable=False)
-    image_data = Column(LargeBinary)
-    pdf_data = Column(LargeBinary , nullable=True)
+    # Legacy in-row blobs, emptied by `python commands.py backfill-assets`;
+    # deferred so catalog queries never pull them by accident
+    image_data = deferred(Column(LargeBinary))
+    pdf_data = deferred(Column(LargeBinary , nullable=True))
+    # Assets live in the content-addressed store (storage.py)
+    image_sha256 = Column(String(64), nullable=True)
+    image_size = Column(Integer, nullable=True)
+    image_mime = Column(String, nullable=True)
+    # Thumbnails keyed "<width>.<format>" and a tiny blurred placeholder, see imaging.py
+    image_variants = deferred(Column(JSON, nullable=True))
+    image_lqip = Column(String, nullable=True)
+    pdf_sha256 = Column(String(64), nullable=True)
+    pdf_size = Column(Integer, nullable=True)
+    pdf_mime = Column(String, nullable=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Lower-cased "title author" maintained by Postgres, indexed for GET /books/search
+    search_text = Column(String, Computed("lower(title || ' ' || author)", persisted=True))
 
     # ✅ Add these two new columns
-    average_rating = Column(Float, default=0.0)
-    rating_count = Column(Integer, default=0)
+    average_rating = Column(Float, default=0.0, server_default="0", nullable=False)
+    rating_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Sum of all scores, kept in step with rating_count by crud.rate_book
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    # Star histogram: how many ratings have score 1..5
+    rating_1 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_2 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_3 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_4 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_5 = Column(Integer, default=0, server_default="0", nullable=False)
 
     ratings = relationship("Rating", back_populates="book", cascade="all, delete")
     order_items = relationship("OrderItem", back_populates="book", cascade="all, delete")
@@ -29,19 +64,58 @@ class Book(Base):
     
     cart_items = relationship("CartItem", back_populates="book")
 
+    @property
+    def has_pdf(self):
+        return bool(self.pdf_size)
+
+    @property
+    def image_url(self):
+        return image_url(self.id, self.image_sha256, self.updated_at)
+
+    @property
+    def rating_histogram(self):
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
     def __repr__(self):
         return f"<Book(title='{self.title}', author='{self.author}')>"
 
+    # Keyset pagination indexes for GET /books (sort key + id tie-breaker)
+    __table_args__ = (
+        Index("ix_books_title_id", "title", "id"),
+        Index("ix_books_author_id", "author", "id"),
+        Index("ix_books_price_id", "price", "id"),
+        Index("ix_books_created_at_id", "created_at", "id"),
+        Index("ix_books_average_rating_id", "average_rating", "id"),
+        # Search: trigrams for substring / typo matches, tsvector for whole words
+        Index(
+            "ix_books_search_trgm", "search_text",
+            postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_books_search_tsv", text("to_tsvector('simple', search_text)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+event.listen(
+    Book.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="user")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Carried in access tokens as "ver"; bumping it revokes every token issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     ratings = relationship("Rating", back_populates="user")
     orders = relationship("Order", back_populates="user", cascade="all, delete")
@@ -58,19 +132,30 @@ class User(Base):
 class Order(Base):
     __tablename__ = "orders"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     status = Column(String, default="placed")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Set by fulfillment.advance_orders as the order moves through its statuses
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    shipped_at = Column(DateTime(timezone=True), nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete")
 
+    __table_args__ = (
+        # Due-order scans: WHERE status = ? AND created_at < ?
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        # Order history pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"))
+    id = Column(Integer, primary_key=True)
+    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"), index=True)
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"))
     title = Column(String)
     price = Column(Float)
@@ -83,18 +168,23 @@ class OrderItem(Base):
 class Rating(Base):
     __tablename__ = "ratings"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"))
     score = Column(Integer)  # Rating from 1 to 5
     user = relationship("User", back_populates="ratings")
     book = relationship("Book", back_populates="ratings")
 
+    __table_args__ = (
+        Index("ix_ratings_user_id_book_id", "user_id", "book_id", unique=True),
+        Index("ix_ratings_book_id", "book_id"),
+    )
+
 
 class Payment(Base):
     __tablename__ = "payments"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"), nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -102,14 +192,51 @@ class Payment(Base):
     user = relationship("User", back_populates="payments")
     book = relationship("Book", back_populates="payments")
 
+    __table_args__ = (
+        Index("ix_payments_user_id_book_id", "user_id", "book_id", unique=True),
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Every token descended from one login; replaying a rotated token revokes the family
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    # HMAC-SHA256 of the opaque token; the token itself is never stored
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    used_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True))
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped per user, so clients only have to make them unique for themselves
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # SHA-256 of method, path and body: a reused key must repeat the same request
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
 
 class CartItem(Base):
     __tablename__ = "cart_items"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"))
     quantity = Column(Integer, default=1)
 
     user = relationship("User", back_populates="cart_items")
     book = relationship("Book",  back_populates="cart_items")
+
+    __table_args__ = (
+        Index("ix_cart_items_user_id_book_id", "user_id", "book_id", unique=True),
+    )
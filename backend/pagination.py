@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import literal, tuple_
+
+# ------------------------
+# KEYSET (CURSOR) PAGINATION
+# ------------------------
+# A cursor is the sort key of the last row on a page, base64-encoded so
+# clients treat it as opaque. The next page seeks past it with a row
+# comparison, which an index on the same columns serves directly, so page N
+# costs the same as page 1 (no OFFSET scan).
+
+
+def encode_cursor(sort: str, descending: bool, values) -> str:
+    payload = {
+        "s": sort,
+        "d": descending,
+        "v": [v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, UUID) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool, columns) -> list:
+    """Sort key values from a cursor; ValueError (a 400 in the routes) if it is malformed or for another sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("v"), list):
+        raise ValueError("Invalid cursor")
+    values = payload["v"]
+    if payload.get("s") != sort or payload.get("d") != descending or len(values) != len(columns):
+        raise ValueError("Cursor does not match the requested sort")
+    try:
+        return [_coerce(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _coerce(value, column):
+    """Cursor JSON value -> the column's Python type; TypeError if the JSON type does not fit."""
+    python_type = column.type.python_type
+    if python_type in (datetime, UUID, str):
+        if not isinstance(value, str):
+            raise TypeError(f"expected a string, got {type(value).__name__}")
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return UUID(value) if python_type is UUID else value
+    if python_type is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"expected a number, got {type(value).__name__}")
+        return float(value)
+    if python_type is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise TypeError(f"expected an integer, got {type(value).__name__}")
+        return value
+    return value
+
+
+def seek(query, columns, descending: bool, limit: int, after=None):
+    """Apply ORDER BY / seek predicate / LIMIT for one page.
+
+    Fetches limit + 1 rows; the extra row only tells the caller whether a
+    next page exists.
+    """
+    if after is not None:
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(after, columns)])
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def page(rows, limit: int, sort: str, descending: bool, key):
+    """Split a limit + 1 result into (items, next_cursor)."""
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(sort, descending, key(items[-1]))
+    return items, next_cursor
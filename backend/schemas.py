@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from uuid import UUID
 from typing import Optional, List
 from datetime import datetime
+from enum import Enum
 
 
 # ======== BOOK SCHEMAS =========
@@ -19,16 +20,46 @@ class Book(BookBase):
     id: UUID
    
     has_pdf: bool = False  # ✅ Indicates if PDF is uploaded for this book
+    image_url: Optional[str] = None  # versioned, safe to cache immutably
+    image_lqip: Optional[str] = None  # blurred data: URI placeholder
+    image_size: Optional[int] = None
+    pdf_size: Optional[int] = None
     average_rating: float = 0.0
     rating_count: int = 0
+    rating_histogram: List[int]  # ratings with 1..5 stars
     class Config:
         orm_mode = True
 
+class BookRatings(BaseModel):
+    book_id: UUID
+    average_rating: float
+    rating_count: int
+    rating_histogram: List[int]
+
+class BookSort(str, Enum):
+    title = "title"
+    author = "author"
+    price = "price"
+    created_at = "created_at"
+    average_rating = "average_rating"
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+class BookPage(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
 
 # ======== TOKEN SCHEMAS =========
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -55,15 +86,21 @@ class UserOut(UserBase):
 
 
 class OrderItemCreate(BaseModel):
+    book_id: UUID
+    # Accepted for older clients but ignored: the server prices orders from the catalog
+    title: Optional[str] = None
+    price: Optional[float] = None
+    quantity: int = Field(gt=0)
+
+class OrderCreate(BaseModel):
+    items: List[OrderItemCreate] = Field(min_length=1)
+
+class OrderItemOut(BaseModel):
     book_id: UUID
     title: str
     price: float
     quantity: int
 
-class OrderCreate(BaseModel):
-    items: List[OrderItemCreate]
-
-class OrderItemOut(OrderItemCreate):
     class Config:
         orm_mode = True
 
@@ -71,10 +108,34 @@ class OrderOut(BaseModel):
     id: UUID
     status: str
     created_at: datetime
+    processed_at: Optional[datetime] = None
+    shipped_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
     items: List[OrderItemOut]
 
     class Config:
         orm_mode = True
+
+class OrderPage(BaseModel):
+    items: List[OrderOut]
+    next_cursor: Optional[str] = None
+
+class OrderSummary(BaseModel):
+    id: UUID
+    status: str
+    created_at: datetime
+    processed_at: Optional[datetime] = None
+    shipped_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+    item_count: int
+    total: float
+
+    class Config:
+        orm_mode = True
+
+class OrderSummaryPage(BaseModel):
+    items: List[OrderSummary]
+    next_cursor: Optional[str] = None
         
         
         
@@ -89,6 +150,7 @@ class RatingOut(BaseModel):
     score: float  # ✅ must be float
     average_rating: float
     rating_count: int
+    rating_histogram: List[int]
     class Config:
         from_attributes = True
 
@@ -106,3 +168,25 @@ class CartItemOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class CartOp(BaseModel):
+    """One change to a cart line: add delta (negative to take away) or set the quantity (0 removes)."""
+    book_id: UUID
+    delta: Optional[int] = None
+    set_quantity: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def one_change(self):
+        if (self.delta is None) == (self.set_quantity is None):
+            raise ValueError("give exactly one of delta or set_quantity")
+        return self
+
+class CartPatch(BaseModel):
+    ops: List[CartOp] = Field(min_length=1, max_length=200)
+
+class CartLine(BaseModel):
+    id: UUID  # the book id
+    title: str
+    author: str
+    price: float
+    quantity: int
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+from config import settings
+
+# ------------------------
+# CONTENT-ADDRESSED ASSET STORE
+# ------------------------
+# Blobs are keyed by their sha256, so identical uploads are stored once and a
+# stored asset never changes. The books row keeps only hash, size and mime type.
+
+
+class StoredAsset(NamedTuple):
+    sha256: str
+    size: int
+    mime_type: Optional[str]
+
+
+class AssetStore:
+    def save(self, stream: BinaryIO, mime_type: Optional[str] = None) -> StoredAsset:
+        raise NotImplementedError
+
+    def open(self, sha256: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> None:
+        raise NotImplementedError
+
+    def iter_range(self, sha256: str, start: int = 0, end: Optional[int] = None, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) in bounded chunks."""
+        chunk_size = chunk_size or settings.asset_chunk_size
+        with self.open(sha256) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+class LocalAssetStore(AssetStore):
+    def __init__(self, root: str, chunk_size: int = 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.chunk_size = chunk_size
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def save(self, stream: BinaryIO, mime_type: Optional[str] = None) -> StoredAsset:
+        # Hash while streaming to a temp file, then move it under its digest
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            digest = hasher.hexdigest()
+            dest = self.path(digest)
+            if os.path.exists(dest):
+                os.unlink(tmp_path)  # duplicate upload, keep the existing copy
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return StoredAsset(digest, size, mime_type)
+
+    def open(self, sha256: str) -> BinaryIO:
+        return open(self.path(sha256), "rb")
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def delete(self, sha256: str) -> None:
+        try:
+            os.unlink(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+BACKENDS = {
+    "local": lambda: LocalAssetStore(settings.asset_root, settings.asset_chunk_size),
+}
+
+_store: Optional[AssetStore] = None
+
+
+def get_asset_store() -> AssetStore:
+    global _store
+    if _store is None:
+        _store = BACKENDS[settings.asset_backend]()
+    return _store
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# BACKGROUND TASKS
+# ------------------------
+# In-process periodic jobs started from main.lifespan. The job body is sync
+# (it uses SessionLocal), so it runs in the threadpool, off the event loop.
+# Every worker process runs its own copy.
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval: float, func: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task = None
+
+    async def run_once(self):
+        try:
+            await run_in_threadpool(self.func)
+        except Exception:
+            logger.exception("background task %s failed", self.name)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# ------------------------
+# PROCESS POOLS
+# ------------------------
+# CPU-bound work (bcrypt, image derivatives) runs on process pools created on
+# first use. Request threads can race to that first use, so creation is
+# guarded by a lock: every thread of the worker shares one executor.
+
+
+class ProcessPool:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers never inherit the parent's DB connections or threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self, wait: bool = False):
+        """Stop the executor (pending work is cancelled unless wait); the next get() starts a new one."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
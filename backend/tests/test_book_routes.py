@@ -0,0 +1,54 @@
+"""Book write routes return the same rating aggregates as the catalog reads.
+
+Runs against TEST_DATABASE_URL (see test_cart_concurrency.py); skipped when unset.
+"""
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def client():
+    # conftest.py points the app's engine at TEST_DATABASE_URL; importing main creates the tables
+    import auth, main
+
+    admin = auth.Principal(id=uuid.uuid4(), username="admin", email=None, role="admin")
+    main.app.dependency_overrides[auth.admin_only] = lambda: admin
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def rated_book(client):
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    book = models.Book(
+        title=f"rated-{uuid.uuid4().hex[:8]}", author="test", price=1, description="",
+        rating_sum=13, rating_count=4, average_rating=3.25, rating_2=1, rating_4=3,
+    )
+    db.add(book)
+    db.commit()
+    yield book.id
+    db.delete(book)
+    db.commit()
+    db.close()
+
+
+def test_update_book_keeps_the_rating_histogram(client, rated_book):
+    response = client.put(
+        f"/books/{rated_book}",
+        json={"title": "Renamed", "author": "test", "price": 2, "description": "new"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["title"] == "Renamed"
+    assert body["rating_count"] == 4
+    assert body["rating_histogram"] == [0, 1, 0, 3, 0]
+    assert client.get(f"/books/{rated_book}").json()["rating_histogram"] == body["rating_histogram"]
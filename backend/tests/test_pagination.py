@@ -0,0 +1,58 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+import models
+import pagination
+
+COLUMNS = (models.Book.title, models.Book.id)
+
+
+def cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    book_id = uuid.uuid4()
+    encoded = pagination.encode_cursor("title", False, ("Dune", book_id))
+    assert pagination.decode_cursor(encoded, "title", False, COLUMNS) == ["Dune", book_id]
+
+    columns = (models.Book.price, models.Book.created_at)
+    created = datetime(2026, 10, 18, 12, 30)
+    encoded = pagination.encode_cursor("price", True, (9.5, created))
+    assert pagination.decode_cursor(encoded, "price", True, columns) == [9.5, created]
+
+
+@pytest.mark.parametrize("payload", [
+    {"s": "title", "d": False, "v": 5},
+    {"s": "title", "d": False, "v": [{"a": 1}, str(uuid.uuid4())]},
+    {"s": "title", "d": False, "v": ["Dune", 7]},
+    {"s": "title", "d": False, "v": ["Dune", "not-a-uuid"]},
+    {"s": "title", "d": False},
+    [1, 2],
+    "title",
+])
+def test_malformed_cursor_is_rejected(payload):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor(cursor(payload), "title", False, COLUMNS)
+
+
+@pytest.mark.parametrize("value", ["9.5", True, None])
+def test_numeric_sort_key_must_be_a_number(value):
+    payload = {"s": "price", "d": False, "v": [value, str(uuid.uuid4())]}
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor(cursor(payload), "price", False, (models.Book.price, models.Book.id))
+
+
+def test_cursor_for_another_sort_is_rejected():
+    encoded = pagination.encode_cursor("title", True, ("Dune", uuid.uuid4()))
+    with pytest.raises(ValueError, match="does not match"):
+        pagination.decode_cursor(encoded, "title", False, COLUMNS)
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor("!!!", "title", False, COLUMNS)
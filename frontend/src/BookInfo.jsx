@@ -9,6 +9,8 @@ import {
   Button,
   Box,
   Tooltip,
+  Rating,
+  LinearProgress,
 } from "@mui/material";
 import { useNavigate, useParams } from "react-router-dom";
 import LockIcon from "@mui/icons-material/Lock";
@@ -63,7 +65,7 @@ const BookInfo = () => {
         <CardMedia
           component="img"
           sx={{ width: 300 }}
-          image={`${API}/books/${book.id}/image`}
+          image={`${API}${book.image_url}`}
           alt={book.title}
         />
         <CardContent>
@@ -80,6 +82,35 @@ const BookInfo = () => {
             ₦{book.price}
           </Typography>
 
+          <Box sx={{ display: "flex", alignItems: "center", gap: 1, mb: 1 }}>
+            <Rating value={book.average_rating} precision={0.1} readOnly />
+            <Typography variant="body2" color="text.secondary">
+              {book.average_rating.toFixed(1)} ({book.rating_count})
+            </Typography>
+          </Box>
+          {book.rating_count > 0 && (
+            <Box sx={{ maxWidth: 260, mb: 2 }}>
+              {[5, 4, 3, 2, 1].map((star) => {
+                const count = book.rating_histogram[star - 1];
+                return (
+                  <Box key={star} sx={{ display: "flex", alignItems: "center", gap: 1 }}>
+                    <Typography variant="caption" sx={{ width: 24 }}>
+                      {star}★
+                    </Typography>
+                    <LinearProgress
+                      variant="determinate"
+                      value={(100 * count) / book.rating_count}
+                      sx={{ flexGrow: 1, height: 6, borderRadius: 3 }}
+                    />
+                    <Typography variant="caption" sx={{ width: 32, textAlign: "right" }}>
+                      {count}
+                    </Typography>
+                  </Box>
+                );
+              })}
+            </Box>
+          )}
+
           {book.has_pdf && (
             <Tooltip
               title={
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import {
   AppBar,
@@ -41,6 +41,7 @@ import {
 import { Link, useNavigate } from "react-router-dom";
 import { useCart } from "./CartContext";
 import imageleft from "./assets/bookshelve.jpg";
+import { clearSession } from "./session.js";
 
 // ✅ Live Chat Component
 const LiveChat = () => {
@@ -63,48 +64,68 @@ const API = "http://localhost:8000";
 const BookList = () => {
   const [books, setBooks] = useState([]);
   const [searchQuery, setSearchQuery] = useState("");
+  const [activeQuery, setActiveQuery] = useState("");
   const [loading, setLoading] = useState(true);
   const [categories, setCategories] = useState([]);
   const [selectedCategory, setSelectedCategory] = useState("All");
   const [page, setPage] = useState(1);
+  // cursors.current[i] fetches page i + 1; grows as the server hands out next_cursor
+  const cursors = useRef([null]);
+  const [pageCount, setPageCount] = useState(1);
   const booksPerPage = 8;
 
   const { cart, addToCart } = useCart();
   const [drawerOpen, setDrawerOpen] = useState(false);
   const navigate = useNavigate();
 
+  // Debounce typing, then restart paging against /books/search (or /books when cleared)
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      const q = searchQuery.trim();
+      const next = q.length >= 2 ? q : "";
+      if (next === activeQuery) return;
+      cursors.current = [null];
+      setPageCount(1);
+      setPage(1);
+      setActiveQuery(next);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery, activeQuery]);
+
   useEffect(() => {
     const fetchBooks = async () => {
       try {
-        const res = await axios.get(`${API}/books`);
-        setBooks(res.data);
+        const params = { limit: booksPerPage };
+        const cursor = cursors.current[page - 1];
+        if (cursor) params.cursor = cursor;
+        if (activeQuery) params.q = activeQuery;
+        const url = activeQuery ? `${API}/books/search` : `${API}/books`;
+        const res = await axios.get(url, { params });
+        const { items, next_cursor } = res.data;
+        setBooks(items);
         setLoading(false);
-        const cats = [...new Set(res.data.map((b) => b.category || "Other"))];
+        if (next_cursor && cursors.current.length === page) {
+          cursors.current.push(next_cursor);
+          setPageCount(cursors.current.length);
+        }
+        const cats = [...new Set(items.map((b) => b.category || "Other"))];
         setCategories(["All", ...cats]);
       } catch (err) {
         console.error("Failed to fetch books:", err);
       }
     };
     fetchBooks();
-  }, []);
+  }, [page, activeQuery]);
 
   const toggleDrawer = () => setDrawerOpen(!drawerOpen);
 
   const logout = () => {
-    localStorage.removeItem("token");
+    clearSession();
     navigate("/");
   };
 
   const filteredBooks = books.filter(
-    (book) =>
-      (selectedCategory === "All" || book.category === selectedCategory) &&
-      (book.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        book.author.toLowerCase().includes(searchQuery.toLowerCase()))
-  );
-
-  const paginatedBooks = filteredBooks.slice(
-    (page - 1) * booksPerPage,
-    page * booksPerPage
+    (book) => selectedCategory === "All" || book.category === selectedCategory
   );
 
   const handleRatingChange = async (bookId, newValue) => {
@@ -343,7 +364,7 @@ const BookList = () => {
           </Grid>
         ) : (
           <Grid container spacing={4}>
-            {paginatedBooks.map((book) => (
+            {filteredBooks.map((book) => (
               <Grid item xs={12} sm={6} md={3} key={book.id}>
                 <Card
                   sx={{
@@ -362,8 +383,14 @@ const BookList = () => {
                   <CardMedia
                     component="img"
                     height="180"
-                    image={`${API}/books/${book.id}/image`}
+                    image={`${API}${book.image_url}&w=320`}
                     alt={book.title}
+                    sx={{
+                      backgroundImage: book.image_lqip
+                        ? `url(${book.image_lqip})`
+                        : undefined,
+                      backgroundSize: "cover",
+                    }}
                   />
                   <CardContent>
                     <Typography variant="h6" noWrap>
@@ -429,7 +456,7 @@ const BookList = () => {
 
         <Box display="flex" justifyContent="center" mt={4}>
           <Pagination
-            count={Math.ceil(filteredBooks.length / booksPerPage)}
+            count={pageCount}
             page={page}
             onChange={(e, value) => setPage(value)}
             color="primary"
@@ -17,6 +17,7 @@ import {
 import { Edit, Delete, Logout } from "@mui/icons-material";
 import { useNavigate } from "react-router-dom";
 import { jwtDecode } from "jwt-decode";
+import { clearSession, refreshSession } from "./session.js";
 
 const API = "http://localhost:8000";
 
@@ -89,8 +90,7 @@ const BookManager = () => {
   const [activeTab, setActiveTab] = useState("login");
 
   const logout = useCallback(() => {
-    localStorage.removeItem("token");
-    localStorage.removeItem("user");
+    clearSession();
     setToken("");
     navigate("/");
   }, [navigate]);
@@ -103,7 +103,8 @@ const BookManager = () => {
         const role = decoded?.role;
 
         if (Date.now() >= expiry * 1000) {
-          logout();
+          refreshSession().then(setToken).catch(logout);
+          return;
         }
 
         if (role !== "admin") {
@@ -118,8 +119,17 @@ const BookManager = () => {
 
   const fetchBooks = useCallback(async () => {
     try {
-      const res = await axios.get(`${API}/books`);
-      setBooks(res.data);
+      // The admin table lists everything, so walk every page
+      const all = [];
+      let cursor = null;
+      do {
+        const params = { limit: 100 };
+        if (cursor) params.cursor = cursor;
+        const res = await axios.get(`${API}/books`, { params });
+        all.push(...res.data.items);
+        cursor = res.data.next_cursor;
+      } while (cursor);
+      setBooks(all);
     } catch (err) {
       console.error("Error fetching books:", err);
     }
@@ -139,6 +149,7 @@ const BookManager = () => {
       const res = await axios.post(`${API}/token`, form);
       const accessToken = res.data.access_token;
       localStorage.setItem("token", accessToken);
+      localStorage.setItem("refresh_token", res.data.refresh_token);
       setToken(accessToken);
 
       const userRes = await axios.get(`${API}/users/me`, {
@@ -410,7 +421,7 @@ const BookManager = () => {
                     <ListItem key={book.id} divider alignItems="flex-start">
                       <Box sx={{ display: "flex", width: "100%" }}>
                         <img
-                          src={`${API}/books/${book.id}/image`}
+                          src={`${API}${book.image_url}`}
                           alt="Book"
                           style={{ width: 60, height: "auto", marginRight: 10 }}
                         />
@@ -1,9 +1,11 @@
 // CartProvider.jsx
-import React, { useEffect, useState, useCallback } from "react";
+import React, { useEffect, useState, useCallback, useRef } from "react";
 import { CartContext } from "./CartContext";
 import axios from "axios";
 
 const API = "http://localhost:8000";
+// Cart changes are batched into one PATCH /cart after this much quiet time
+const FLUSH_DELAY_MS = 400;
 
 export const CartProvider = ({ children }) => {
   const [cart, setCart] = useState([]);
@@ -28,35 +30,91 @@ export const CartProvider = ({ children }) => {
     }
   }, [token, fetchCartFromBackend]);
 
-  const syncAdd = async (book, quantity) => {
+  // Pending changes per book, folded in order: { book_id, delta } or { book_id, set_quantity }
+  const pending = useRef(new Map());
+  const flushTimer = useRef(null);
+  const inFlight = useRef(false);
+
+  const flush = useCallback(async () => {
+    clearTimeout(flushTimer.current);
+    if (inFlight.current || pending.current.size === 0) return;
+    const ops = [...pending.current.values()];
+    pending.current = new Map();
+    inFlight.current = true;
     try {
-      await axios.post(
-        `${API}/cart/add`,
-        {
-          book_id: book.id,
-          title: book.title,
-          price: book.price,
-          quantity: quantity,
-        },
+      const res = await axios.patch(
+        `${API}/cart`,
+        { ops },
         {
-          headers: { Authorization: `Bearer ${token}` },
+          // A fresh key per batch: a retried request is not applied twice
+          headers: {
+            Authorization: `Bearer ${token}`,
+            "Idempotency-Key": crypto.randomUUID(),
+          },
         }
       );
+      // Only adopt the server's cart if nothing changed locally meanwhile
+      if (pending.current.size === 0) setCart(res.data);
     } catch (err) {
-      console.error("Failed to sync add to backend cart:", err);
+      console.error("Failed to sync cart changes to backend:", err);
+      if (pending.current.size === 0) fetchCartFromBackend();
+    } finally {
+      inFlight.current = false;
+      if (pending.current.size > 0) {
+        flushTimer.current = setTimeout(flush, FLUSH_DELAY_MS);
+      }
     }
-  };
+  }, [token, fetchCartFromBackend]);
 
-  const syncRemove = async (book_id) => {
-    try {
-      await axios.delete(`${API}/cart/remove/${book_id}`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-    } catch (err) {
-      console.error("Failed to sync remove from backend cart:", err);
+  const queueChange = (book_id, change) => {
+    if (!token) return;
+    const previous = pending.current.get(book_id);
+    let op;
+    if (change.set_quantity !== undefined) {
+      op = { book_id, set_quantity: change.set_quantity };
+    } else if (previous && previous.set_quantity !== undefined) {
+      op = { book_id, set_quantity: Math.max(previous.set_quantity + change.delta, 0) };
+    } else {
+      op = { book_id, delta: (previous ? previous.delta : 0) + change.delta };
     }
+    pending.current.set(book_id, op);
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flush, FLUSH_DELAY_MS);
   };
 
+  // Send whatever is pending when the tab is hidden or closed. An XHR can be
+  // aborted while the page unloads, so this flush uses a keepalive fetch,
+  // which the browser completes after the tab is gone.
+  const flushOnHide = useCallback(() => {
+    clearTimeout(flushTimer.current);
+    if (!token || pending.current.size === 0) return;
+    const ops = [...pending.current.values()];
+    pending.current = new Map();
+    fetch(`${API}/cart`, {
+      method: "PATCH",
+      keepalive: true,
+      headers: {
+        Authorization: `Bearer ${token}`,
+        "Content-Type": "application/json",
+        "Idempotency-Key": crypto.randomUUID(),
+      },
+      body: JSON.stringify({ ops }),
+    }).catch((err) => console.error("Failed to sync cart changes to backend:", err));
+  }, [token]);
+
+  useEffect(() => {
+    const onHide = () => {
+      if (document.visibilityState === "hidden") flushOnHide();
+    };
+    document.addEventListener("visibilitychange", onHide);
+    window.addEventListener("pagehide", flushOnHide);
+    return () => {
+      document.removeEventListener("visibilitychange", onHide);
+      window.removeEventListener("pagehide", flushOnHide);
+      flush();
+    };
+  }, [flush, flushOnHide]);
+
   const addToCart = (book) => {
     setCart((prev) => {
       const exists = prev.find((item) => item.id === book.id);
@@ -70,12 +128,12 @@ export const CartProvider = ({ children }) => {
       return updated;
     });
 
-    if (token) syncAdd(book, 1);
+    queueChange(book.id, { delta: 1 });
   };
 
   const removeFromCart = (id) => {
     setCart((prev) => prev.filter((item) => item.id !== id));
-    if (token) syncRemove(id);
+    queueChange(id, { set_quantity: 0 });
   };
 
   const increaseQuantity = (id) => {
@@ -86,7 +144,7 @@ export const CartProvider = ({ children }) => {
           item.id === id ? { ...item, quantity: item.quantity + 1 } : item
         )
       );
-      if (token) syncAdd(book, 1);
+      queueChange(id, { delta: 1 });
     }
   };
 
@@ -101,7 +159,7 @@ export const CartProvider = ({ children }) => {
             item.id === id ? { ...item, quantity: item.quantity - 1 } : item
           )
         );
-        if (token) syncAdd(book, -1);
+        queueChange(id, { delta: -1 });
       }
     }
   };
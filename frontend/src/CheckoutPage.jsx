@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useMemo, useState } from "react";
 import { useCart } from "./CartContext";
 import {
   Container,
@@ -18,6 +18,8 @@ const API = "http://localhost:8000";
 const CheckoutPage = () => {
   const { cart, clearCart } = useCart();
   const navigate = useNavigate();
+  // One key per cart: retries and double clicks replay the first order instead of placing another
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [cart]);
   const [form, setForm] = useState({
     name: "",
     email: "",
@@ -55,6 +57,7 @@ const CheckoutPage = () => {
         headers: {
           "Content-Type": "application/json",
           Authorization: `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKey,
         },
         body: JSON.stringify(orderData),
       });
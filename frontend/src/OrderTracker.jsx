@@ -21,6 +21,7 @@ import HomeIcon from "@mui/icons-material/Home";
 import LogoutIcon from "@mui/icons-material/Logout";
 import TrackChangesIcon from "@mui/icons-material/TrackChanges";
 import { useSearchParams, useNavigate, Link } from "react-router-dom";
+import { clearSession } from "./session.js";
 
 const API = "http://localhost:8000";
 const steps = ["placed", "processed", "shipped", "delivered"];
@@ -33,35 +34,41 @@ const OrderTracker = () => {
   const [drawerOpen, setDrawerOpen] = useState(false);
   const navigate = useNavigate();
 
-  // Polling effect for live updates every 30 seconds
+  // Load the order once, then follow status changes pushed by the server
   useEffect(() => {
     if (!orderId) return;
 
-    const fetchOrder = () => {
-      axios
-        .get(`${API}/orders/${orderId}`)
-        .then((res) => {
-          const fetchedOrder = res.data;
-          setOrder(fetchedOrder);
-
-          const stepIndex = steps.findIndex(
-            (s) => s.toLowerCase() === fetchedOrder.status.toLowerCase()
-          );
-          setActiveStep(stepIndex !== -1 ? stepIndex : 0);
-        })
-        .catch((err) => {
-          console.error("Order not found", err);
-          setOrder(null);
-        });
+    const applyStatus = (status) => {
+      const stepIndex = steps.findIndex(
+        (s) => s.toLowerCase() === status.toLowerCase()
+      );
+      setActiveStep(stepIndex !== -1 ? stepIndex : 0);
     };
 
-    fetchOrder(); // Initial load
-    const interval = setInterval(fetchOrder, 30000); // Poll every 30s
-    return () => clearInterval(interval); // Cleanup on unmount
+    axios
+      .get(`${API}/orders/${orderId}`)
+      .then((res) => {
+        setOrder(res.data);
+        applyStatus(res.data.status);
+      })
+      .catch((err) => {
+        console.error("Order not found", err);
+        setOrder(null);
+      });
+
+    // EventSource reconnects by itself and resumes from the last event id
+    const source = new EventSource(`${API}/orders/${orderId}/events`);
+    source.addEventListener("status", (e) => {
+      const update = JSON.parse(e.data);
+      setOrder((current) => (current ? { ...current, ...update } : current));
+      applyStatus(update.status);
+      if (update.status === "delivered") source.close();
+    });
+    return () => source.close(); // Cleanup on unmount
   }, [orderId]);
 
   const logout = () => {
-    localStorage.removeItem("token");
+    clearSession();
     navigate("/");
   };
 
@@ -33,21 +33,31 @@ const drawerWidth = 240;
 
 const Orders = () => {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const navigate = useNavigate();
 
-  useEffect(() => {
+  // Orders come newest first, one page at a time
+  const fetchOrders = (cursor = null) => {
     const token = localStorage.getItem("token");
     if (!token) return;
 
     axios
       .get(`${API}/orders`, {
         headers: { Authorization: `Bearer ${token}` },
+        params: { limit: 20, ...(cursor ? { cursor } : {}) },
+      })
+      .then((res) => {
+        setOrders((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+        setNextCursor(res.data.next_cursor);
       })
-      .then((res) => setOrders(res.data))
       .catch((err) => {
         console.error("Failed to fetch orders", err);
-        setOrders([]);
+        if (!cursor) setOrders([]);
       });
+  };
+
+  useEffect(() => {
+    fetchOrders();
   }, []);
 
   const handleDeleteOrder = async (orderId) => {
@@ -230,6 +240,14 @@ const Orders = () => {
             </Card>
           ))
         )}
+
+        {nextCursor && (
+          <Box sx={{ display: "flex", justifyContent: "center" }}>
+            <Button variant="outlined" onClick={() => fetchOrders(nextCursor)}>
+              Load more orders
+            </Button>
+          </Box>
+        )}
       </Box>
     </Box>
   );
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import { useParams, useNavigate } from "react-router-dom";
 import {
@@ -16,6 +16,8 @@ const PayPage = () => {
   const navigate = useNavigate();
   const [book, setBook] = useState(null);
   const [loading, setLoading] = useState(false);
+  // Reused by every attempt on this page, so a retried payment is not charged twice
+  const paymentKey = useRef(crypto.randomUUID());
 
   useEffect(() => {
     axios
@@ -36,7 +38,12 @@ const PayPage = () => {
       await axios.post(
         `${API}/pay/${id}`, // Send book_id as path param
         null, // No body required
-        { headers: { Authorization: `Bearer ${token}` } }
+        {
+          headers: {
+            Authorization: `Bearer ${token}`,
+            "Idempotency-Key": paymentKey.current,
+          },
+        }
       );
       alert("Payment successful!");
       navigate(`/books/${id}`);
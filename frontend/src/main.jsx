@@ -4,6 +4,7 @@ import { BrowserRouter } from "react-router-dom";
 import { CartProvider } from "./CartProvider.jsx";
 import "./index.css";
 import App from "./App.jsx";
+import "./session.js";
 
 createRoot(document.getElementById("root")).render(
   <StrictMode>
@@ -0,0 +1,58 @@
+import axios from "axios";
+
+const API = "http://localhost:8000";
+
+// Access tokens live 30 minutes; the refresh token renews them without the
+// password. Concurrent 401s share a single renewal.
+let pending = null;
+
+export const refreshSession = () => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return Promise.reject(new Error("No refresh token"));
+  if (!pending) {
+    pending = axios
+      .post(`${API}/token/refresh`, { refresh_token: refreshToken }, { skipAuthRefresh: true })
+      .then((res) => {
+        localStorage.setItem("token", res.data.access_token);
+        localStorage.setItem("refresh_token", res.data.refresh_token);
+        return res.data.access_token;
+      })
+      .catch((err) => {
+        localStorage.removeItem("token");
+        localStorage.removeItem("refresh_token");
+        throw err;
+      })
+      .finally(() => {
+        pending = null;
+      });
+  }
+  return pending;
+};
+
+export const clearSession = () => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (refreshToken) {
+    axios.post(`${API}/token/revoke`, { refresh_token: refreshToken }, { skipAuthRefresh: true }).catch(() => {});
+  }
+  localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
+  localStorage.removeItem("user");
+};
+
+// Retry a request once with a renewed access token after a 401
+axios.interceptors.response.use(undefined, async (error) => {
+  const config = error.config;
+  if (
+    error.response?.status !== 401 ||
+    !config ||
+    config.skipAuthRefresh ||
+    config._retried ||
+    !localStorage.getItem("refresh_token")
+  ) {
+    throw error;
+  }
+  config._retried = true;
+  const token = await refreshSession();
+  config.headers.Authorization = `Bearer ${token}`;
+  return axios(config);
+});